@@ -33,6 +33,7 @@
 import cv2
 import numpy
 import pygame
+import sys
 import time
 import utils
 
@@ -170,21 +171,99 @@ class CaptureManager(object):
 
 
 class WindowManager(object):
-    def __init__(self, windowName, keypressCallback=None):
+    """
+    The WindowManager class shows frames in a window and polls its events.
+
+    The display can be decoupled from the frame rate: maxDisplayFps limits
+    how many frames per second reach imshow (the others are skipped, but
+    still processed and recorded by the caller), eventPollInterval limits
+    how often waitKey runs, and a previewScale below 1 shows a downscaled
+    proxy of each frame.
+    """
+
+    def __init__(
+        self,
+        windowName,
+        keypressCallback=None,
+        maxDisplayFps=None,  # None shows every frame
+        eventPollInterval=None,  # seconds; None polls on every call
+        previewScale=1.0,
+    ):
         self.keypressCallback = keypressCallback
+        self.maxDisplayFps = maxDisplayFps
+        self.eventPollInterval = eventPollInterval
+        self.previewScale = previewScale
 
         self._windowName = windowName
         self._isWindowCreated = False
 
+        # private properties for the display throttle
+        self._nextShowTime = None
+        self._lastPollTime = None
+        self._previewFrame = None
+        self._framesShown = 0
+        self._framesSkipped = 0
+
     @property
     def isWindowCreated(self):
         return self._isWindowCreated
 
+    @property
+    def framesShown(self):
+        return self._framesShown
+
+    @property
+    def framesSkipped(self):
+        """Frames passed to show() that the display throttle skipped."""
+        return self._framesSkipped
+
     def createWindow(self):
         cv2.namedWindow(self._windowName)
         self._isWindowCreated = True
 
+    def isFrameDue(self):
+        """
+        Return whether the next call to show() will display its frame, so
+        that callers can skip preparing frames that would not be shown.
+        """
+        if not self.maxDisplayFps or self._nextShowTime is None:
+            return True
+        return time.perf_counter() >= self._nextShowTime
+
     def show(self, frame):
+        if not self.isFrameDue():
+            self._framesSkipped += 1
+            return
+
+        if self.maxDisplayFps:
+            now = time.perf_counter()
+            interval = 1.0 / self.maxDisplayFps
+            # Keep a steady cadence, but restart it after falling behind.
+            if self._nextShowTime is None or now - self._nextShowTime > interval:
+                self._nextShowTime = now
+            self._nextShowTime += interval
+
+        self._display(self._preview(frame))
+        self._framesShown += 1
+
+    def _preview(self, frame):
+        """
+        Return the frame, or a downscaled proxy of it if previewScale < 1.
+        """
+        if self.previewScale >= 1.0:
+            return frame
+        height, width = frame.shape[:2]
+        size = (
+            max(1, int(round(width * self.previewScale))),
+            max(1, int(round(height * self.previewScale))),
+        )
+        # cv2.resize() reuses the buffer while the size stays the same.
+        self._previewFrame = cv2.resize(
+            frame, size, self._previewFrame, interpolation=cv2.INTER_AREA
+        )
+        return self._previewFrame
+
+    def _display(self, frame):
         cv2.imshow(self._windowName, frame)
 
     def destroyWindow(self):
@@ -192,43 +271,104 @@ class WindowManager(object):
         self._isWindowCreated = False
 
     def processEvents(self):
+        if self._isPollSkipped():
+            return
         keycode = cv2.waitKey(1)
         if self.keypressCallback is not None and keycode != -1:
             self.keypressCallback(keycode)
 
+    def _isPollSkipped(self):
+        """
+        Return whether to skip this poll because the last one was less than
+        eventPollInterval seconds ago.
+        """
+        if not self.eventPollInterval:
+            return False
+        now = time.perf_counter()
+        if (
+            self._lastPollTime is not None
+            and now - self._lastPollTime < self.eventPollInterval
+        ):
+            return True
+        self._lastPollTime = now
+        return False
+
 
 class PygameWindowManager(WindowManager):
+    def __init__(self, windowName, keypressCallback=None, **throttleArgs):
+        WindowManager.__init__(self, windowName, keypressCallback, **throttleArgs)
+
+        # The display surface and the frame's view of it persist between
+        # frames and are only recreated when the frame size changes.
+        self._frameSize = None
+        self._displaySurface = None
+        self._isDisplayBGRX = False
+        self._rgbFrame = None
+        self._rgbSurface = None
+
     def createWindow(self):
         pygame.display.init()
         pygame.display.set_caption(self._windowName)
         self._isWindowCreated = True
 
-    def show(self, frame):
+    def _display(self, frame):
         # Find the frame's dimensions in (w, h) format.
         frameSize = frame.shape[1::-1]
-
-        # Convert the frame to RGB, which Pygame requires.
-        if utils.isGray(frame):
-            conversionType = cv2.COLOR_GRAY2RGB
+        if frameSize != self._frameSize:
+            self._resizeWindow(frameSize)
+
+        isGray = utils.isGray(frame)
+        if self._isDisplayBGRX:
+            # Convert straight into the display surface's pixels.
+            width, height = frameSize
+            pitch = self._displaySurface.get_pitch()
+            pixels = numpy.frombuffer(
+                self._displaySurface.get_buffer(), numpy.uint8
+            ).reshape(height, pitch // 4, 4)[:, :width]
+            if isGray:
+                cv2.cvtColor(frame, cv2.COLOR_GRAY2BGRA, pixels)
+            else:
+                cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA, pixels)
+            # Unlock the surface before flipping it.
+            del pixels
         else:
-            conversionType = cv2.COLOR_BGR2RGB
-        rgbFrame = cv2.cvtColor(frame, conversionType)
-
-        # Convert the frame to Pygame's Surface type.
-        pygameFrame = pygame.image.frombuffer(rgbFrame.tostring(), frameSize, "RGB")
-
-        # Resize the window to match the frame.
-        displaySurface = pygame.display.set_mode(frameSize)
-
-        # Blit and display the frame.
-        displaySurface.blit(pygameFrame, (0, 0))
+            # Convert the frame to RGB, which Pygame requires, in the buffer
+            # that _rgbSurface shares, then blit it.
+            if isGray:
+                cv2.cvtColor(frame, cv2.COLOR_GRAY2RGB, self._rgbFrame)
+            else:
+                cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, self._rgbFrame)
+            self._displaySurface.blit(self._rgbSurface, (0, 0))
         pygame.display.flip()
 
+    def _resizeWindow(self, frameSize):
+        width, height = frameSize
+        self._frameSize = frameSize
+        self._displaySurface = pygame.display.set_mode(frameSize)
+
+        # A 32-bit surface whose bytes are B, G, R, X can take the frame
+        # directly; otherwise Pygame converts from an RGB surface in the blit.
+        masks = self._displaySurface.get_masks()[:3]
+        self._isDisplayBGRX = (
+            self._displaySurface.get_bytesize() == 4
+            and masks == (0xFF0000, 0x00FF00, 0x0000FF)
+            and sys.byteorder == "little"
+        )
+        self._rgbFrame = None
+        self._rgbSurface = None
+        if not self._isDisplayBGRX:
+            self._rgbFrame = numpy.empty((height, width, 3), numpy.uint8)
+            self._rgbSurface = pygame.image.frombuffer(self._rgbFrame, frameSize, "RGB")
+
     def destroyWindow(self):
         pygame.display.quit()
         self._isWindowCreated = False
+        self._frameSize = None
+        self._displaySurface = None
 
     def processEvents(self):
+        if self._isPollSkipped():
+            return
         for event in pygame.event.get():
             if event.type == pygame.KEYDOWN and self.keypressCallback is not None:
                 self.keypressCallback(event.key)
@@ -0,0 +1,373 @@
+import argparse
+import concurrent.futures
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import cv2
+import numpy
+from capture_manager import CaptureManager
+from video_writer import AsyncVideoWriter
+from seek_index import SeekIndex
+import filter
+
+
+# Filters that can be named in a --filters chain.
+FILTERS = {
+    "strokeEdges": lambda: filter.strokeEdges,
+    "recolorRC": lambda: filter.recolorRC,
+    "recolorRGV": lambda: filter.recolorRGV,
+    "recolorCMV": lambda: filter.recolorCMV,
+    "crossProcess": filter.BGRCrossProcessCurveFilter,
+    "portra": filter.BGRPortraCurveFilter,
+    "provia": filter.BGRProviaCurveFilter,
+    "velvia": filter.BGRVelviaCurveFilter,
+    "blur": filter.BlurFilter,
+    "sharpen": filter.SharpenFilter,
+    "findEdges": filter.FindEdgesFilter,
+    "emboss": filter.EmbossFilter,
+}
+
+
+def createFilterPipeline(names) -> filter.FilterPipeline:
+    """
+    Return a FilterPipeline for a chain of filter names from FILTERS.
+    """
+    unknown = [name for name in names if name not in FILTERS]
+    if unknown:
+        raise ValueError(
+            f"unknown filter(s) {', '.join(unknown)}; choose from {', '.join(FILTERS)}"
+        )
+    return filter.FilterPipeline([FILTERS[name]() for name in names])
+
+
+def transcode(
+    inputPath: str,
+    outputPath: str,
+    startTime: float = 0.0,
+    endTime: float = None,
+    crop: tuple = None,
+    size: tuple = None,
+    pipeline: filter.FilterPipeline = None,
+    encoding: int = cv2.VideoWriter_fourcc("M", "J", "P", "G"),
+) -> dict:
+    """
+    Preprocess a video file without any window and write the result.
+
+    :param startTime: 开始时间（秒）
+    :param endTime: 结束时间（秒），None 表示处理到视频末尾
+    :return: the number of frames, the wall time and the media time processed
+    """
+    fps, _ = probeVideo(inputPath)
+    startFrame = int(round(startTime * fps))
+    endFrame = None if endTime is None else int(round(endTime * fps))
+    return transcodeFrames(
+        inputPath, outputPath, startFrame, endFrame, crop, size, pipeline, encoding
+    )
+
+
+def transcodeFrames(
+    inputPath: str,
+    outputPath: str,
+    startFrame: int = 0,
+    endFrame: int = None,
+    crop: tuple = None,
+    size: tuple = None,
+    pipeline: filter.FilterPipeline = None,
+    encoding: int = cv2.VideoWriter_fourcc("M", "J", "P", "G"),
+) -> dict:
+    """
+    Preprocess the frames [startFrame, endFrame) of a video file and write them.
+    """
+    capture = cv2.VideoCapture(inputPath)
+    if not capture.isOpened():
+        raise IOError(f"cannot open video {inputPath}")
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    captureManager = CaptureManager(capture, None, False)
+
+    if startFrame > 0:
+        captureManager.useSeekIndex(inputPath)
+    if startFrame > 0 and not captureManager.jumpToFrame(startFrame):
+        # The backend could not land exactly on the frame, so decode up to it.
+        capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        for _ in range(startFrame):
+            if not capture.grab():
+                captureManager.release()
+                raise ValueError(f"cannot seek {inputPath} to frame {startFrame}")
+
+    if crop is not None:
+        captureManager.roi = crop
+    captureManager.outputSize = size
+    # Keep every input frame: locking to the wall clock, or estimating the
+    # FPS from it, only suits live capture.
+    captureManager.startWritingVideo(
+        outputPath,
+        encoding,
+        lockToTimeline=False,
+        fps=fps if fps > 0.0 else AsyncVideoWriter.FALLBACK_FPS,
+    )
+    wallStartTime = time.perf_counter()
+    framesProcessed = 0
+    while endFrame is None or startFrame + framesProcessed < endFrame:
+        captureManager.enterFrame()
+        if captureManager.frame is None:
+            captureManager.exitFrame()
+            break
+        if pipeline is not None:
+            # The frame is already cropped and resized by the CaptureManager.
+            frame = captureManager.frame
+            pipeline.apply(frame, frame)
+        captureManager.exitFrame()
+        framesProcessed += 1
+    captureManager.release()
+    capture.release()
+
+    return {
+        "frames": framesProcessed,
+        "wallSeconds": time.perf_counter() - wallStartTime,
+        "mediaSeconds": framesProcessed / fps if fps > 0.0 else None,
+    }
+
+
+def transcodeSharded(
+    inputPath: str,
+    outputPath: str,
+    numWorkers: int,
+    startTime: float = 0.0,
+    endTime: float = None,
+    crop: tuple = None,
+    size: tuple = None,
+    filterNames: list = (),
+    encoding: int = cv2.VideoWriter_fourcc("M", "J", "P", "G"),
+) -> dict:
+    """
+    Like transcode(), but split the video into numWorkers time ranges that are
+    processed in parallel worker processes, then joined in order.
+
+    Each worker opens its own capture, seeks exactly to the first frame of
+    its range and builds its own filter chain from filterNames.
+    """
+    fps, _ = probeVideo(inputPath)
+    # CAP_PROP_FRAME_COUNT may be estimated from the duration, so take the
+    # exact count from the keyframe index, which the workers need anyway.
+    frameCount = SeekIndex.load(inputPath).frameCount
+    startFrame = int(round(startTime * fps))
+    endFrame = (
+        frameCount if endTime is None else min(int(round(endTime * fps)), frameCount)
+    )
+    if endFrame <= startFrame:
+        raise ValueError(f"empty range [{startTime}, {endTime}) in {inputPath}")
+    bounds = numpy.linspace(startFrame, endFrame, numWorkers + 1).astype(int)
+
+    wallStartTime = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="mycameo_shards_") as shardDir:
+        extension = os.path.splitext(outputPath)[1]
+        segmentPaths = [
+            os.path.join(shardDir, f"{i:03d}{extension}") for i in range(numWorkers)
+        ]
+        with concurrent.futures.ProcessPoolExecutor(
+            numWorkers, initializer=cv2.setNumThreads, initargs=(1,)
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _transcodeSegment,
+                    inputPath,
+                    segmentPath,
+                    int(bounds[i]),
+                    int(bounds[i + 1]),
+                    crop,
+                    size,
+                    list(filterNames),
+                    encoding,
+                )
+                for i, segmentPath in enumerate(segmentPaths)
+                if bounds[i + 1] > bounds[i]
+            ]
+            framesProcessed = sum(future.result()["frames"] for future in futures)
+        concatenateVideos(
+            [path for path in segmentPaths if os.path.exists(path)],
+            outputPath,
+            fps,
+            encoding,
+        )
+
+    return {
+        "frames": framesProcessed,
+        "wallSeconds": time.perf_counter() - wallStartTime,
+        "mediaSeconds": framesProcessed / fps if fps > 0.0 else None,
+    }
+
+
+def _transcodeSegment(
+    inputPath, segmentPath, startFrame, endFrame, crop, size, filterNames, encoding
+):
+    return transcodeFrames(
+        inputPath,
+        segmentPath,
+        startFrame,
+        endFrame,
+        crop,
+        size,
+        createFilterPipeline(filterNames),
+        encoding,
+    )
+
+
+def concatenateVideos(segmentPaths: list, outputPath: str, fps: float, encoding: int):
+    """
+    Join video segments, in order, into one file.
+
+    Use ffmpeg's concat demuxer without re-encoding when ffmpeg is installed;
+    otherwise decode the segments and re-encode them with OpenCV.
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is not None:
+        listPath = outputPath + ".concat.txt"
+        with open(listPath, "w", encoding="utf-8") as listFile:
+            for path in segmentPaths:
+                escapedPath = os.path.abspath(path).replace("'", "'\\''")
+                listFile.write(f"file '{escapedPath}'\n")
+        try:
+            subprocess.run(
+                [ffmpeg, "-v", "error", "-y", "-f", "concat", "-safe", "0"]
+                + ["-i", listPath, "-c", "copy", outputPath],
+                check=True,
+            )
+        finally:
+            os.remove(listPath)
+        return
+
+    writer = None
+    for path in segmentPaths:
+        capture = cv2.VideoCapture(path)
+        while True:
+            success, frame = capture.read()
+            if not success:
+                break
+            if writer is None:
+                height, width = frame.shape[:2]
+                writer = cv2.VideoWriter(outputPath, encoding, fps, (width, height))
+            writer.write(frame)
+        capture.release()
+    if writer is not None:
+        writer.release()
+
+
+def probeVideo(inputPath: str) -> tuple:
+    """
+    Return the FPS and the frame count of a video file.
+    """
+    capture = cv2.VideoCapture(inputPath)
+    if not capture.isOpened():
+        raise IOError(f"cannot open video {inputPath}")
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    frameCount = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    capture.release()
+    return fps, frameCount
+
+
+def formatThroughput(stats: dict) -> str:
+    """
+    Return frames/s and the realtime factor of transcode() statistics.
+    """
+    wallSeconds = max(stats["wallSeconds"], 1e-9)
+    text = f"{stats['frames']} frames in {wallSeconds:.2f} s, "
+    text += f"{stats['frames'] / wallSeconds:.1f} frames/s"
+    if stats["mediaSeconds"] is not None:
+        text += f", {stats['mediaSeconds'] / wallSeconds:.2f}x realtime"
+    return text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Crop, resize and filter videos without a window."
+    )
+    parser.add_argument("inputs", nargs="+", help="input video file(s)")
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="{stem}_out.avi",
+        help="output path; {stem} is replaced by the input's name (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--start", type=float, default=0.0, help="start time in seconds"
+    )
+    parser.add_argument("--end", type=float, default=None, help="end time in seconds")
+    parser.add_argument(
+        "--crop",
+        type=int,
+        nargs=4,
+        metavar=("X", "Y", "WIDTH", "HEIGHT"),
+        help="region to keep",
+    )
+    parser.add_argument(
+        "--size", type=int, nargs=2, metavar=("WIDTH", "HEIGHT"), help="output size"
+    )
+    parser.add_argument(
+        "--filters",
+        nargs="*",
+        default=[],
+        metavar="FILTER",
+        help=f"filters to apply in order: {', '.join(FILTERS)}",
+    )
+    parser.add_argument("--fourcc", default="MJPG", help="output codec (default: MJPG)")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="split each input into this many time ranges processed in parallel",
+    )
+    args = parser.parse_args(argv)
+
+    if len(args.inputs) > 1 and "{stem}" not in args.output:
+        parser.error("--output must contain {stem} when there are several inputs")
+    if len(args.fourcc) != 4:
+        parser.error("--fourcc must be 4 characters")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    try:
+        pipeline = createFilterPipeline(args.filters)
+    except ValueError as error:
+        parser.error(str(error))
+
+    totals = {"frames": 0, "wallSeconds": 0.0, "mediaSeconds": 0.0}
+    for inputPath in args.inputs:
+        stem = os.path.splitext(os.path.basename(inputPath))[0]
+        outputPath = args.output.format(stem=stem)
+        encoding = cv2.VideoWriter_fourcc(*args.fourcc)
+        if args.workers > 1:
+            stats = transcodeSharded(
+                inputPath,
+                outputPath,
+                args.workers,
+                args.start,
+                args.end,
+                args.crop,
+                args.size,
+                args.filters,
+                encoding,
+            )
+        else:
+            stats = transcode(
+                inputPath,
+                outputPath,
+                args.start,
+                args.end,
+                args.crop,
+                args.size,
+                pipeline,
+                encoding,
+            )
+        print(f"{inputPath} -> {outputPath}: {formatThroughput(stats)}")
+        for key in totals:
+            if totals[key] is not None and stats[key] is not None:
+                totals[key] += stats[key]
+            else:
+                totals[key] = None
+    if len(args.inputs) > 1:
+        print(f"total: {formatThroughput(totals)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+import argparse
+import os
+import timeit
+import cv2
+import numpy
+
+import utils
+import filter
+from tile_executor import TileExecutor
+
+
+def _bestTime(func, number: int = 1, repeat: int = 5) -> float:
+    """
+    Return the best time, in seconds, of one call to func.
+    """
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+FRAME_SIZES = {"720p": (1280, 720), "1080p": (1920, 1080), "4K": (3840, 2160)}
+
+
+def _randomFrame(size: tuple, channels: int = 3) -> numpy.ndarray:
+    """
+    Return a reproducible random BGR (or gray) frame of size (width, height).
+    """
+    width, height = size
+    shape = (height, width, channels) if channels > 1 else (height, width)
+    return numpy.random.default_rng(0).integers(0, 256, shape, numpy.uint8)
+
+
+def _referenceLookupArray(func, length=256):
+    """
+    The original per-integer construction of a lookup array, for comparison.
+    """
+    if func is None:
+        return None
+    lookupArray = numpy.empty(length)
+    i = 0
+    while i < length:
+        func_i = func(i)
+        lookupArray[i] = min(max(0, func_i), length - 1)
+        i += 1
+    return lookupArray
+
+
+def benchmarkLookupArrays():
+    """
+    Compare the old and new construction of the curve filters' lookup arrays.
+    """
+    curves = {
+        "Portra": dict(
+            vPoints=[(0, 0), (23, 20), (157, 173), (255, 255)],
+            bPoints=[(0, 0), (41, 46), (231, 228), (255, 255)],
+            gPoints=[(0, 0), (52, 47), (189, 196), (255, 255)],
+            rPoints=[(0, 0), (69, 69), (213, 218), (255, 255)],
+        ),
+        "Velvia": dict(
+            vPoints=[(0, 0), (128, 118), (221, 215), (255, 255)],
+            bPoints=[(0, 0), (25, 21), (122, 153), (165, 206), (255, 255)],
+            gPoints=[(0, 0), (25, 21), (95, 102), (181, 208), (255, 255)],
+            rPoints=[(0, 0), (41, 28), (183, 209), (255, 255)],
+        ),
+    }
+    for name, points in curves.items():
+        vFunc = utils.createCurveFunc(points["vPoints"])
+
+        def buildReference():
+            for key in ("bPoints", "gPoints", "rPoints"):
+                func = utils.createCurveFunc(points[key])
+                _referenceLookupArray(utils.createCompositeFunc(func, vFunc))
+
+        def buildVectorized():
+            for key in ("bPoints", "gPoints", "rPoints"):
+                func = utils.createCurveFunc(points[key])
+                utils.createLookupArray(utils.createCompositeFunc(func, vFunc))
+
+        # The results must agree once truncated to the uint8 lookup values.
+        for key in ("bPoints", "gPoints", "rPoints"):
+            func = utils.createCompositeFunc(utils.createCurveFunc(points[key]), vFunc)
+            reference = _referenceLookupArray(func).astype(numpy.uint8)
+            assert numpy.array_equal(reference, utils.createLookupArray(func))
+
+        filterClass = getattr(filter, f"BGR{name}CurveFilter")
+        referenceTime = _bestTime(buildReference)
+        vectorizedTime = _bestTime(buildVectorized)
+        cachedTime = _bestTime(filterClass, number=100)
+        print(
+            f"{name:8s} loop {referenceTime * 1e3:8.3f} ms"
+            f"  vectorized {vectorizedTime * 1e3:8.3f} ms"
+            f"  cached filter {cachedTime * 1e3:8.3f} ms"
+            f"  ({referenceTime / vectorizedTime:.0f}x, {referenceTime / cachedTime:.0f}x)"
+        )
+
+
+def _referenceBGRFuncApply(bgrFilter, src, dst):
+    """
+    The original split/lookup/merge application of a BGRFuncFilter, with the
+    merge into dst restored, for comparison.
+    """
+    b, g, r = cv2.split(src)
+    for channel, lookupArray in zip(
+        (b, g, r),
+        (bgrFilter._bLookupArray, bgrFilter._gLookupArray, bgrFilter._rLookupArray),
+    ):
+        if lookupArray is not None:
+            channel[:] = lookupArray.astype(numpy.float64)[channel]
+    cv2.merge([b, g, r], dst)
+
+
+def benchmarkBGRLookup():
+    """
+    Verify and time the single-pass cv2.LUT application of the BGR curve filters.
+    """
+    src = _randomFrame(FRAME_SIZES["1080p"])
+    reference = numpy.empty_like(src)
+    dst = numpy.empty_like(src)
+    for name in ("CrossProcess", "Portra", "Provia", "Velvia"):
+        bgrFilter = getattr(filter, f"BGR{name}CurveFilter")()
+        _referenceBGRFuncApply(bgrFilter, src, reference)
+        bgrFilter.apply(src, dst)
+        assert numpy.array_equal(reference, dst), name
+
+        referenceTime = _bestTime(
+            lambda: _referenceBGRFuncApply(bgrFilter, src, reference)
+        )
+        lutTime = _bestTime(lambda: bgrFilter.apply(src, dst))
+        print(
+            f"{name:12s} 1080p split/merge {referenceTime * 1e3:7.2f} ms"
+            f"  cv2.LUT {lutTime * 1e3:6.2f} ms  ({referenceTime / lutTime:.0f}x)"
+        )
+
+
+def benchmarkFilterFusion():
+    """
+    Compare stacked colour grades applied one by one and through a FilterPipeline.
+    """
+    src = _randomFrame(FRAME_SIZES["1080p"])
+    filters = [
+        filter.VCurveFilter([(0, 0), (128, 110), (255, 255)]),
+        filter.BGRPortraCurveFilter(),
+        filter.BGRVelviaCurveFilter(),
+        filter.VCurveFilter([(0, 12), (255, 243)]),
+    ]
+    pipeline = filter.FilterPipeline(filters)
+
+    def applySequentially(dst):
+        numpy.copyto(dst, src)
+        for stageFilter in filters:
+            stageFilter.apply(dst, dst)
+
+    reference = numpy.empty_like(src)
+    dst = numpy.empty_like(src)
+    applySequentially(reference)
+    pipeline.apply(src, dst)
+    assert numpy.array_equal(reference, dst)
+
+    sequentialTime = _bestTime(lambda: applySequentially(reference))
+    fusedTime = _bestTime(lambda: pipeline.apply(src, dst))
+    print(
+        f"{len(filters)} grades 1080p sequential {sequentialTime * 1e3:6.2f} ms"
+        f"  fused {fusedTime * 1e3:6.2f} ms  ({pipeline.numPasses} pass,"
+        f" {pipeline.passesSaved} saved)"
+    )
+
+
+def _referenceStrokeEdges(src, dst, blurKsize=7, edgeKsize=5):
+    """
+    The original float64 strokeEdges, for comparison.
+    """
+    if blurKsize >= 3:
+        blurredSrc = cv2.medianBlur(src, blurKsize)
+        graySrc = cv2.cvtColor(blurredSrc, cv2.COLOR_BGR2GRAY)
+    else:
+        graySrc = cv2.cvtColor(src, cv2.COLOR_BGR2GRAY)
+    cv2.Laplacian(graySrc, cv2.CV_8U, graySrc, ksize=edgeKsize)
+    normalizedInverseAlpha = (1.0 / 255) * (255 - graySrc)
+    channels = cv2.split(src)
+    for channel in channels:
+        channel[:] = channel * normalizedInverseAlpha
+    cv2.merge(channels, dst)
+
+
+def benchmarkStrokeEdges():
+    """
+    Check strokeEdges against the float64 original and time it at 1080p.
+    """
+    src = cv2.GaussianBlur(_randomFrame(FRAME_SIZES["1080p"]), (0, 0), 3)
+    reference = numpy.empty_like(src)
+    dst = numpy.empty_like(src)
+    _referenceStrokeEdges(src, reference)
+
+    # The original truncates where cv2.multiply rounds, so allow 1 level.
+    filter.strokeEdges(src, dst)
+    difference = cv2.absdiff(reference, dst)
+    assert difference.max() <= 1, difference.max()
+
+    filter.strokeEdges(src, dst, downscaleEdges=True)
+    downscaledPsnr = cv2.PSNR(reference, dst)
+
+    referenceTime = _bestTime(lambda: _referenceStrokeEdges(src, reference))
+    integerTime = _bestTime(lambda: filter.strokeEdges(src, dst))
+    downscaledTime = _bestTime(
+        lambda: filter.strokeEdges(src, dst, downscaleEdges=True)
+    )
+    print(
+        f"1080p float64 {referenceTime * 1e3:6.2f} ms"
+        f"  8-bit {integerTime * 1e3:6.2f} ms (max diff {difference.max()})"
+        f"  half-res edges {downscaledTime * 1e3:6.2f} ms"
+        f" (PSNR {downscaledPsnr:.1f} dB)"
+    )
+
+    # Without the median blur, which is common to both, to isolate the stroke.
+    referenceTime = _bestTime(
+        lambda: _referenceStrokeEdges(src, reference, blurKsize=0)
+    )
+    integerTime = _bestTime(lambda: filter.strokeEdges(src, dst, blurKsize=0))
+    print(
+        f"1080p no blur float64 {referenceTime * 1e3:6.2f} ms"
+        f"  8-bit {integerTime * 1e3:6.2f} ms"
+    )
+
+
+def _referenceBlend(foregroundSrc, backgroundSrc, dst, alphaMask):
+    """
+    The original float64 split/merge blend, for comparison.
+    """
+    maxAlpha = numpy.iinfo(alphaMask.dtype).max
+    normalizedAlphaMask = (1.0 / maxAlpha) * alphaMask
+    normalizedInverseAlphaMask = 1.0 - normalizedAlphaMask
+    foregroundChannels = cv2.split(foregroundSrc)
+    backgroundChannels = cv2.split(backgroundSrc)
+    for foregroundChannel, backgroundChannel in zip(
+        foregroundChannels, backgroundChannels
+    ):
+        backgroundChannel[:] = (
+            normalizedAlphaMask * foregroundChannel
+            + normalizedInverseAlphaMask * backgroundChannel
+        )
+    cv2.merge(backgroundChannels, dst)
+
+
+def benchmarkBlend():
+    """
+    Check the fixed-point blend against the float64 original and time it.
+    """
+    size = FRAME_SIZES["1080p"]
+    foreground = _randomFrame(size)
+    background = cv2.flip(foreground, -1)
+    alphaMask = _randomFrame(size, channels=1)
+    blendMask = filter.BlendMask(alphaMask)
+    reference = numpy.empty_like(foreground)
+    dst = numpy.empty_like(foreground)
+
+    # The original truncates where the fixed-point blend rounds.
+    _referenceBlend(foreground, background, reference, alphaMask)
+    filter.blend(foreground, background, dst, alphaMask)
+    assert cv2.absdiff(reference, dst).max() <= 1
+
+    timings = [
+        ("float64", lambda: _referenceBlend(foreground, background, dst, alphaMask)),
+        ("uint16", lambda: filter.blend(foreground, background, dst, alphaMask)),
+        ("cached mask", lambda: filter.blend(foreground, background, dst, blendMask)),
+        (
+            "4 tiles",
+            lambda: filter.blend(foreground, background, dst, blendMask, numTiles=4),
+        ),
+    ]
+    print(
+        "1080p "
+        + "  ".join(f"{name} {_bestTime(func) * 1e3:6.2f} ms" for name, func in timings)
+    )
+
+
+def _referenceRecolor(name, src, dst):
+    """
+    The original split/merge recolor filters, for comparison.
+    """
+    b, g, r = cv2.split(src)
+    if name == "RC":
+        cv2.addWeighted(b, 0.5, g, 0.5, 0, b)
+        cv2.merge((b, b, r), dst)
+        return
+    reduce = cv2.min if name == "RGV" else cv2.max
+    reduce(b, g, b)
+    reduce(b, r, b)
+    cv2.merge((b, g, r), dst)
+
+
+def benchmarkRecolor():
+    """
+    Check the fused recolor filters, in place too, and time them at 1080p.
+    """
+    src = _randomFrame(FRAME_SIZES["1080p"])
+    reference = numpy.empty_like(src)
+    dst = numpy.empty_like(src)
+    for name in ("RC", "RGV", "CMV"):
+        recolor = getattr(filter, f"recolor{name}")
+        _referenceRecolor(name, src, reference)
+        recolor(src, dst)
+        inPlace = src.copy()
+        recolor(inPlace, inPlace)
+        # addWeighted rounds halves to even where cv2.transform rounds them up.
+        assert cv2.absdiff(reference, dst).max() <= (1 if name == "RC" else 0), name
+        assert numpy.array_equal(dst, inPlace), name
+
+        # These take a few ms, so take the best of more runs to skip noise.
+        referenceTime = _bestTime(
+            lambda: _referenceRecolor(name, src, reference), repeat=20
+        )
+        fusedTime = _bestTime(lambda: recolor(src, dst), repeat=20)
+        print(
+            f"recolor{name:3s} 1080p split/merge {referenceTime * 1e3:6.2f} ms"
+            f"  fused {fusedTime * 1e3:6.2f} ms  ({referenceTime / fusedTime:.1f}x)"
+        )
+
+
+def benchmarkConvolutions():
+    """
+    Compare the built-in convolution filters with a dense filter2D of their
+    original float64 kernels, at each frame size.
+    """
+    filters = {
+        "blur": filter.BlurFilter(),
+        "sharpen": filter.SharpenFilter(),
+        "findEdges": filter.FindEdgesFilter(),
+        "emboss": filter.EmbossFilter(),
+    }
+    for sizeName, size in FRAME_SIZES.items():
+        src = _randomFrame(size)
+        reference = numpy.empty_like(src)
+        dst = numpy.empty_like(src)
+        for name, convolutionFilter in filters.items():
+            kernel = convolutionFilter._kernel.astype(numpy.float64)
+            cv2.filter2D(src, -1, kernel, reference)
+            convolutionFilter.apply(src, dst)
+            # The box blur sums in integers where filter2D rounds a float sum.
+            assert cv2.absdiff(reference, dst).max() <= 1, name
+
+            referenceTime = _bestTime(lambda: cv2.filter2D(src, -1, kernel, reference))
+            filterTime = _bestTime(lambda: convolutionFilter.apply(src, dst))
+            print(
+                f"{sizeName:5s} {name:9s} float64 filter2D {referenceTime * 1e3:7.2f} ms"
+                f"  {convolutionFilter.method:9s} {filterTime * 1e3:7.2f} ms"
+                f"  ({referenceTime / filterTime:.1f}x)"
+            )
+
+
+def benchmarkTiling():
+    """
+    Check tiled filters against untiled ones and report their scaling from 1
+    thread to the number of CPUs at 1080p, with OpenCV's own threading off.
+    """
+    src = cv2.GaussianBlur(_randomFrame(FRAME_SIZES["1080p"]), (0, 0), 3)
+    background = cv2.flip(src, -1)
+    blendMask = filter.BlendMask(_randomFrame(FRAME_SIZES["1080p"], channels=1))
+
+    def tiled(stageFilter):
+        return lambda executor: filter.TiledFilter(stageFilter, executor=executor).apply
+
+    def tiledBlend(executor):
+        return lambda src, dst: filter.blend(
+            src, background, dst, blendMask, executor.numTiles, executor
+        )
+
+    # Each entry makes an apply(src, dst) that runs on a given executor.
+    filters = {
+        "portra": tiled(filter.BGRPortraCurveFilter()),
+        "recolorRGV": tiled(filter.recolorRGV),
+        "blur": tiled(filter.BlurFilter()),
+        "strokeEdges": tiled(filter.strokeEdges),
+        "blend": tiledBlend,
+    }
+    reference = numpy.empty_like(src)
+    dst = numpy.empty_like(src)
+    threadCounts = range(1, max(2, os.cpu_count() or 1) + 1)
+
+    openCVThreads = cv2.getNumThreads()
+    cv2.setNumThreads(1)
+    try:
+        print(f"{'threads':12s}" + "".join(f"{n:>11d}" for n in threadCounts))
+        for name, makeApply in filters.items():
+            times = []
+            for numThreads in threadCounts:
+                executor = TileExecutor(numThreads)
+                apply = makeApply(executor)
+                apply(src, dst)
+                if numThreads == 1:
+                    numpy.copyto(reference, dst)
+                assert numpy.array_equal(reference, dst), name
+                times.append(_bestTime(lambda: apply(src, dst)))
+                executor.shutdown()
+            print(
+                f"{name:12s}"
+                + "".join(f"{t * 1e3:8.2f} ms" for t in times)
+                + f"  ({times[0] / min(times):.1f}x best)"
+            )
+    finally:
+        cv2.setNumThreads(openCVThreads)
+
+
+BENCHMARKS = {
+    "lut": benchmarkLookupArrays,
+    "bgrlut": benchmarkBGRLookup,
+    "fusion": benchmarkFilterFusion,
+    "strokeedges": benchmarkStrokeEdges,
+    "blend": benchmarkBlend,
+    "convolution": benchmarkConvolutions,
+    "recolor": benchmarkRecolor,
+    "tiling": benchmarkTiling,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the MyCameo pipeline.")
+    parser.add_argument(
+        "names",
+        nargs="*",
+        help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)",
+    )
+    args = parser.parse_args(argv)
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name!r}")
+    for name in args.names or BENCHMARKS:
+        print(f"== {name} ==")
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import numpy
+import threading
+import collections
+
+
+class BufferPool(object):
+    """
+    A thread-safe pool of reusable ndarrays, keyed by shape and dtype.
+
+    acquire() hands out a free buffer of the requested shape, or allocates one if
+    none is free. release() returns a buffer for reuse. Once a loop has warmed
+    up, allocations stays constant while reuses keeps growing.
+    """
+
+    def __init__(self, maxFreePerKey: int = 8):
+        self._maxFreePerKey: int = maxFreePerKey
+        self._free: dict = collections.defaultdict(list)
+        self._lock = threading.Lock()
+
+        # statistics
+        self._allocations: int = 0
+        self._bytesAllocated: int = 0
+        self._reuses: int = 0
+
+    # ==================================================================================================
+    # The BufferPool class has the following properties:
+
+    @property
+    def allocations(self) -> int:
+        """Buffers allocated by, or registered with, the pool."""
+        return self._allocations
+
+    @property
+    def bytesAllocated(self) -> int:
+        return self._bytesAllocated
+
+    @property
+    def reuses(self) -> int:
+        """Calls to acquire() that were served by a released buffer."""
+        return self._reuses
+
+    @property
+    def freeBuffers(self) -> int:
+        with self._lock:
+            return sum(len(buffers) for buffers in self._free.values())
+
+    # ==================================================================================================
+    # The BufferPool class has the following methods:
+
+    def acquire(self, shape: tuple, dtype=numpy.uint8) -> numpy.ndarray:
+        """
+        Return a buffer of the given shape and dtype. Its contents are undefined.
+        """
+        key = (tuple(shape), numpy.dtype(dtype))
+        with self._lock:
+            buffers = self._free.get(key)
+            if buffers:
+                self._reuses += 1
+                return buffers.pop()
+        buffer = numpy.empty(shape, dtype)
+        self.register(buffer)
+        return buffer
+
+    def release(self, buffer: numpy.ndarray):
+        """
+        Return a buffer to the pool. The caller must not use it afterwards.
+        """
+        if buffer is None or buffer.base is not None:
+            # Views share memory with their base, so they cannot be reused alone.
+            return
+        key = (buffer.shape, buffer.dtype)
+        with self._lock:
+            buffers = self._free[key]
+            if len(buffers) < self._maxFreePerKey:
+                buffers.append(buffer)
+
+    def register(self, buffer: numpy.ndarray):
+        """
+        Count a buffer allocated elsewhere (e.g. by VideoCapture.retrieve()).
+        """
+        with self._lock:
+            self._allocations += 1
+            self._bytesAllocated += buffer.nbytes
+
+    def clear(self):
+        """
+        Drop every free buffer.
+        """
+        with self._lock:
+            self._free.clear()
+
+
+# The pool shared by the capture manager, its writers and the filters.
+sharedPool = BufferPool()
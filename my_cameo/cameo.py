@@ -1,6 +1,7 @@
 import cv2
 from window_manager import WindowManager
 from capture_manager import CaptureManager
+from frame_pipeline import FramePipeline
 import filter
 
 
@@ -16,17 +17,16 @@ class MyCameo(object):
     def run(self):
         """Run the main loop."""
         self._windowManager.createWindow()
-        while self._windowManager.isWindowCreated:
-            self._captureManager.enterFrame()
-            frame = self._captureManager.frame
+        # Capture, filter and display/record overlap on their own threads.
+        # The filter drops to a lower internal resolution when it cannot
+        # keep up with 30 fps.
+        adaptiveFilter = filter.AdaptiveFilter(filter.strokeEdges, budget=1.0 / 30)
+        pipeline = FramePipeline(self._captureManager, adaptiveFilter)
+        pipeline.run(self._windowManager)
+        print(pipeline.formatOccupancy())
+        print(adaptiveFilter.formatStatus())
 
-            if frame is not None:
-                # TODO: Filter the frame (Chapter 3).
-                filter.strokeEdges(frame, frame)
-                pass
-
-            self._captureManager.exitFrame()
-            self._windowManager.processEvents()
+        self._captureManager.release()
 
     def onKeypress(self, keycode: int):
         """
@@ -47,27 +47,41 @@ class MyCameo(object):
         elif keycode == 27:  # escape
             self._windowManager.destroyWindow()
 
-    def preprocess(self, video_path: str):
-        self._captureManager = CaptureManager(
-            cv2.VideoCapture(video_path), self._windowManager, False
-        )
+    def preprocess(
+        self,
+        video_path: str,
+        startTime: float = 138.8,
+        crop: tuple = (0, 0, 1080, 1080),
+        size: tuple = (640, 512),
+    ):
+        """
+        Preview the crop and resize job on a video file; press tab to record it.
+
+        For a headless batch job, run batch.py instead.
+
+        :param startTime: 开始时间（秒）
+        :param crop: (x, y, width, height), by default the left 1080x1080
+            square of a 1080p frame
+        :param size: (width, height)
+        """
+        capture = cv2.VideoCapture(video_path)
+        self._captureManager = CaptureManager(capture, self._windowManager, False)
+        # Everything downstream of the capture only sees the cropped region.
+        self._captureManager.roi = crop
+        self._captureManager.outputSize = size
         self._windowManager.createWindow()
         # 跳转到指定帧
-        _ = self._captureManager.jumpToFrame(start_frame=138.8 * 25)
+        _ = self._captureManager.jumpToFrame(
+            start_frame=startTime * capture.get(cv2.CAP_PROP_FPS)
+        )
 
         while self._windowManager.isWindowCreated:
             self._captureManager.enterFrame()
-            frame: cv2.typing.MatLike = self._captureManager.frame
-
-            if frame is not None:
-                # 切割和分辨率
-                self._captureManager.cropFrame(0, 0, 1920, 1080)
-                self._captureManager.adjustVideoResolution(640, 512)
-                pass
-
             self._captureManager.exitFrame()
             self._windowManager.processEvents()
 
+        self._captureManager.release()
+
 
 if __name__ == "__main__":
     MyCameo().run()
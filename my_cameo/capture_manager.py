@@ -1,5 +1,13 @@
 import cv2
 from window_manager import WindowManager
+from capture_prefetcher import CapturePrefetcher
+from video_writer import AsyncVideoWriter
+from image_writer import AsyncImageWriter
+from buffer_pool import BufferPool, sharedPool
+from seek_index import SeekIndex
+from frame_stats import FrameStats
+from timeline_resampler import TimelineResampler
+import os
 import numpy
 import time
 import sys
@@ -8,12 +16,21 @@ import sys
 class CaptureManager(object):
     """The CaptureManager class manages the capture process."""
 
+    # How resampled and decimated frames are skipped: by grab(), by seeking,
+    # or ("auto") by whichever has been measured to be cheaper.
+    SEEK_POLICIES = ("auto", "grab", "seek")
+
     def __init__(
         self,
         capture: cv2.VideoCapture,
         previewWindowManager: WindowManager = None,
         shouldMirrorPreview: bool = False,
-        insertInterval: int = sys.maxsize,  # 通过插帧控制速率
+        insertInterval: int = sys.maxsize,  # 通过插帧控制速率, see resampler
+        prefetchSize: int = 0,  # 0 disables the background grabber
+        prefetchPolicy: str = "drop",  # "drop" or "block" when the ring is full
+        bufferPool: BufferPool = None,
+        statsLogInterval: float = None,  # seconds between stats log lines
+        resampler: TimelineResampler = None,
     ):
         # public properties
         self.previewWindowManager: WindowManager = previewWindowManager
@@ -23,23 +40,74 @@ class CaptureManager(object):
         self._capture: cv2.VideoCapture = capture
         self._enteredFrame: bool = False  # True if the next call to read() retrieves
         self._frame: cv2.typing.MatLike = None
-        self.insertInterval = insertInterval
+        self._frameTimestamp: float = None  # time.perf_counter() at grab
+        self._seekIndex: SeekIndex = None
+
+        # private properties for the region of interest
+        self._roi: tuple = None  # (x, y, width, height), or None for the whole frame
+        self._outputSize: tuple = None  # (width, height), or None for the ROI's size
+
+        # private properties for frame buffers
+        # _frameBuffer is the pooled array that holds the retrieved frame; _frame
+        # may be a view of it (cropFrame) or one of the _scratchBuffers (resize).
+        self._bufferPool: BufferPool = sharedPool if bufferPool is None else bufferPool
+        self._frameBuffer: numpy.ndarray = None
+        self._frameShape: tuple = None
+        self._scratchBuffers: list = []
+
+        # private properties for background prefetching
+        self._prefetchSize: int = prefetchSize
+        self._prefetchPolicy: str = prefetchPolicy
+        self._prefetcher: CapturePrefetcher = None
+        self._prefetchCounters: dict = {
+            "droppedFrames": 0,
+            "grabberStalls": 0,
+            "consumerStalls": 0,
+        }
+
+        # private properties for resampling the timeline
+        self._resampler: TimelineResampler = None
+        self._insertInterval: int = sys.maxsize
+        self._decimationStride: int = 1
+        self._seekPolicy: str = "auto"
+        self._canSeek: bool = True
+        self._grabCost: float = None  # mean seconds per skipped grab()
+        self._seekCost: float = None  # mean seconds per seek
+        self._seeks: int = 0
+        if resampler is not None:
+            self.resampler = resampler
+        else:
+            self.insertInterval = insertInterval
 
         # private properties for video processing
         self._channel: int = 0
         self._imageFilename: str = None
+        self._imageBurstCount: int = 0
+        self._imageBurstIndex: int = 0
+        self._imageWriter: AsyncImageWriter = AsyncImageWriter(
+            bufferPool=self._bufferPool
+        )
         self._videoFilename: str = None
         self._videoEncoding: int = None
-        self._videoWriter: cv2.VideoWriter = None
+        self._videoQueueSize: int = None
+        self._videoBackpressure: str = None
+        self._videoLockToTimeline: bool = None
+        self._videoFps: float = None
+        self._videoWriter: AsyncVideoWriter = None
 
-        # private properties for FPS estimation
-        self._startTime: float = None
+        # private properties for FPS estimation and stage timing
         self._framesElapsed: int = 0
+        self._sourceFramesElapsed: int = 0
         self._fpsEstimate: float = None
+        self._stats: FrameStats = FrameStats(logInterval=statsLogInterval)
 
     # ==================================================================================================
     # The CaptureManager class has the following properties:
 
+    @property
+    def capture(self) -> cv2.VideoCapture:
+        return self._capture
+
     @property
     def channel(self) -> int:
         return self._channel
@@ -49,14 +117,174 @@ class CaptureManager(object):
         if self._channel != value:
             self._channel = value
             self._frame = None
+            self._stopPrefetching()
+            if self._resampler is not None:
+                self._resampler.reset()
 
     @property
     def frame(self):
-        if self._enteredFrame and self._frame is None:
-            _, self._frame = self._capture.retrieve(self._frame, self.channel)
+        if self._enteredFrame and self._frame is None and self._prefetcher is None:
+            # Retrieve into a pooled buffer so that no array is allocated per frame.
+            if self._frameBuffer is None and self._frameShape is not None:
+                self._frameBuffer = self._bufferPool.acquire(self._frameShape)
+            with self._stats.stage("retrieve"):
+                _, frame = self._capture.retrieve(self._frameBuffer, self.channel)
+            if frame is not None and frame is not self._frameBuffer:
+                # The first frame, or a new size: VideoCapture allocated it.
+                self._bufferPool.register(frame)
+                self._frameShape = frame.shape
+                self._frameBuffer = frame
+            if frame is not None:
+                frame = self._applyRegion(frame)
+            self._frame = frame
 
         return self._frame
 
+    @property
+    def roi(self) -> tuple:
+        """
+        The region of interest, (x, y, width, height), or None for the whole
+        frame. frame, the filters, the preview and the recording only see it.
+        It must lie inside the frame, and it cannot change while a video is
+        being recorded at its size.
+        """
+        return self._roi
+
+    @roi.setter
+    def roi(self, value: tuple):
+        if value is not None:
+            x, y, width, height = (int(v) for v in value)
+            if x < 0 or y < 0 or width < 1 or height < 1:
+                raise ValueError(f"invalid region of interest {value}")
+            value = (x, y, width, height)
+        if value != self._roi:
+            self._checkVideoSizeIsFree("region of interest")
+        self._roi = value
+
+    @property
+    def outputSize(self) -> tuple:
+        """
+        The (width, height) the region of interest is resized to, or None to
+        keep its size. It cannot change while a video is being recorded.
+        """
+        return self._outputSize
+
+    @outputSize.setter
+    def outputSize(self, value: tuple):
+        if value is not None:
+            width, height = (int(v) for v in value)
+            if width < 1 or height < 1:
+                raise ValueError(f"invalid output size {value}")
+            value = (width, height)
+        if value != self._outputSize:
+            self._checkVideoSizeIsFree("output size")
+        self._outputSize = value
+
+    def _checkVideoSizeIsFree(self, name: str):
+        """
+        Raise ValueError if a video file is open at the current frame size,
+        which every later frame would then fail to match.
+        """
+        if self._videoWriter is not None:
+            raise ValueError(
+                f"cannot change the {name} while writing {self._videoFilename}; "
+                "call stopWritingVideo() first"
+            )
+
+    @property
+    def resampler(self) -> TimelineResampler:
+        """
+        The TimelineResampler that drops, repeats or blends frames to change
+        the playback speed, or None to show every frame once.
+        """
+        return self._resampler
+
+    @resampler.setter
+    def resampler(self, value: TimelineResampler):
+        if self._resampler is not None and self._resampler is not value:
+            self._resampler.reset()
+        if not self._enteredFrame and not self._isFramePooled:
+            # Resampled frames bring their own buffers.
+            self._bufferPool.release(self._frameBuffer)
+            self._frameBuffer = None
+        self._resampler = value
+        self._insertInterval = sys.maxsize
+        self._decimationStride = 1
+
+    @property
+    def insertInterval(self) -> int:
+        """
+        Slow playback down by repeating every insertInterval-th frame, or
+        sys.maxsize not to. Kept for compatibility: setting it installs a
+        resampler with a step of (insertInterval - 1) / insertInterval.
+        """
+        return self._insertInterval
+
+    @insertInterval.setter
+    def insertInterval(self, value: int):
+        if value is None or value == sys.maxsize:
+            self.resampler = None
+            return
+        if value < 2:
+            raise ValueError(f"insert interval must be at least 2, got {value}")
+        self.resampler = TimelineResampler((value - 1) / value, False, self._bufferPool)
+        self._insertInterval = value
+
+    @property
+    def decimationStride(self) -> int:
+        """
+        Keep only every decimationStride-th frame, or 1 to keep every frame.
+        The frames in between are skipped without retrieving them (see
+        seekPolicy), and framesElapsed counts the kept frames only. Setting
+        it installs a resampler with that step.
+        """
+        return self._decimationStride
+
+    @decimationStride.setter
+    def decimationStride(self, value: int):
+        value = int(value)
+        if value < 1:
+            raise ValueError(f"decimation stride must be at least 1, got {value}")
+        if value == 1:
+            self.resampler = None
+            return
+        self.resampler = TimelineResampler(value, False, self._bufferPool)
+        self._decimationStride = value
+
+    @property
+    def seekPolicy(self) -> str:
+        """How skipped frames are passed over; one of SEEK_POLICIES."""
+        return self._seekPolicy
+
+    @seekPolicy.setter
+    def seekPolicy(self, value: str):
+        if value not in self.SEEK_POLICIES:
+            raise ValueError(
+                f"seek policy must be one of {self.SEEK_POLICIES}, got {value!r}"
+            )
+        self._seekPolicy = value
+
+    @property
+    def seeks(self) -> int:
+        """Times skipped frames were passed over by seeking."""
+        return self._seeks
+
+    @property
+    def sourceFramesElapsed(self) -> int:
+        """
+        Frames of the capture that were passed over or entered, including
+        those the resampler skipped or repeated only once.
+        """
+        return self._sourceFramesElapsed
+
+    @property
+    def frameTimestamp(self) -> float:
+        """
+        When the current frame was grabbed, in time.perf_counter() seconds.
+        Repeated and blended frames are stamped when they are entered.
+        """
+        return self._frameTimestamp
+
     @property
     def isWritingImage(self):
         return self._imageFilename is not None
@@ -69,6 +297,53 @@ class CaptureManager(object):
     def framesElapsed(self):
         return self._framesElapsed
 
+    @property
+    def fpsEstimate(self) -> float:
+        """Frames per second over the recent rolling window."""
+        return self._fpsEstimate
+
+    @property
+    def stats(self) -> FrameStats:
+        """
+        Rolling FPS and per-stage timings. Time your own stages with it, e.g.
+        with captureManager.stats.stage("filter"): ...
+        """
+        return self._stats
+
+    @property
+    def bufferPool(self) -> BufferPool:
+        """The pool of frame buffers, for its allocation counters."""
+        return self._bufferPool
+
+    @property
+    def imageWriter(self) -> AsyncImageWriter:
+        """The image writer stage, for its compression settings and counters."""
+        return self._imageWriter
+
+    @property
+    def videoWriter(self) -> AsyncVideoWriter:
+        """The active video writer stage, for its queue depth and encode latency."""
+        return self._videoWriter
+
+    @property
+    def isPrefetching(self) -> bool:
+        return self._prefetchSize > 0
+
+    @property
+    def droppedFrames(self) -> int:
+        """Prefetched frames dropped because the consumer fell behind."""
+        return self._prefetchCounter("droppedFrames")
+
+    @property
+    def grabberStalls(self) -> int:
+        """Times the prefetcher blocked on a full ring."""
+        return self._prefetchCounter("grabberStalls")
+
+    @property
+    def consumerStalls(self) -> int:
+        """Times enterFrame() waited on an empty ring."""
+        return self._prefetchCounter("consumerStalls")
+
     # ==================================================================================================
     # The CaptureManager class has the following methods:
 
@@ -82,13 +357,193 @@ class CaptureManager(object):
             "previous enterFrame() had no matching exitFrame()"
         )
 
-        if self._capture is not None:
-            if (self._framesElapsed + 1) % self.insertInterval == 0:
-                self._enteredFrame = True  # 置为True，但是并没有移动指针
-            else:
+        if self._capture is None:
+            return
+
+        if self._resampler is not None:
+            # The resampler times its own grabs and retrieves.
+            frame, timestamp = self._resampler.next(self._skipFrames, self._readFrame)
+            self._enterPooledFrame(frame, timestamp)
+            return
+
+        if self.isPrefetching:
+            # The prefetcher times its own grabs and retrieves; this is only
+            # the wait for its next frame.
+            with self._stats.stage("prefetchWait"):
+                self._enterPooledFrame(*self._startPrefetching().get())
+        else:
+            with self._stats.stage("grab"):
                 self._enteredFrame = (
                     self._capture.grab()
                 )  # 通过grab()移动指针，然后使用retrieve()获取帧
+                self._frameTimestamp = time.perf_counter()
+        if self._enteredFrame:
+            self._sourceFramesElapsed += 1
+
+    def _enterPooledFrame(self, frame: numpy.ndarray, timestamp: float):
+        """
+        Enter a frame that was already retrieved into a buffer from the pool.
+        The buffer is released when the frame is exited.
+        """
+        self._frame = None if frame is None else self._applyRegion(frame)
+        self._frameBuffer = frame
+        self._frameTimestamp = timestamp
+        self._enteredFrame = frame is not None
+
+    def _skipFrames(self, count: int) -> int:
+        """
+        Advance past count frames without retrieving them, for the resampler,
+        by grabbing them or by seeking. Return how many were skipped.
+        """
+        with self._stats.stage("skip"):
+            skipped = self._seekForward(count) if self._shouldSeek(count) else None
+            if skipped is None:
+                skipped = self._grabForward(count)
+        self._sourceFramesElapsed += skipped
+        return skipped
+
+    def _shouldSeek(self, count: int) -> bool:
+        if self.isPrefetching or not self._canSeek or count < 2:
+            return False
+        if self._seekPolicy != "auto":
+            return self._seekPolicy == "seek"
+        if self._grabCost is None:
+            # Measure grabbing first, then try a seek to measure that too.
+            return False
+        if self._seekCost is None:
+            return True
+        return self._seekCost < count * self._grabCost
+
+    def _grabForward(self, count: int) -> int:
+        skipped = 0
+        if self.isPrefetching:
+            # The prefetcher has already retrieved them.
+            while skipped < count:
+                frame, _ = self._startPrefetching().get()
+                if frame is None:
+                    break
+                self._bufferPool.release(frame)
+                skipped += 1
+            return skipped
+
+        startTime = time.perf_counter()
+        while skipped < count and self._capture.grab():
+            skipped += 1
+        if skipped > 0:
+            cost = (time.perf_counter() - startTime) / skipped
+            self._grabCost = _movingAverage(self._grabCost, cost)
+        return skipped
+
+    def _seekForward(self, count: int) -> int:
+        """
+        Seek count frames ahead. Return count, or None if seeking is not
+        possible here and the frames must be grabbed instead.
+        """
+        position = int(self._capture.get(cv2.CAP_PROP_POS_FRAMES))
+        if self._seekIndex is not None:
+            frameCount = self._seekIndex.frameCount
+        else:
+            frameCount = int(self._capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        if frameCount <= 0:
+            # A camera or a stream.
+            self._canSeek = False
+            return None
+        target = position + count
+        if target >= frameCount:
+            # Grab up to the end, which only happens once.
+            return None
+
+        startTime = time.perf_counter()
+        if self._seekIndex is not None:
+            # Land on the preceding keyframe, then decode forward to the target.
+            keyframe = self._seekIndex.keyframeBefore(target)
+            if keyframe <= position:
+                return None
+            isSeeked = self._capture.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+            for _ in range(target - keyframe if isSeeked else 0):
+                if not self._capture.grab():
+                    break
+        else:
+            isSeeked = self._capture.set(cv2.CAP_PROP_POS_FRAMES, target)
+        if not isSeeked or int(self._capture.get(cv2.CAP_PROP_POS_FRAMES)) != target:
+            print(f"Error: Failed to seek to frame {target}; grabbing from now on.")
+            self._canSeek = False
+            self._capture.set(cv2.CAP_PROP_POS_FRAMES, position)
+            return None
+        self._seekCost = _movingAverage(self._seekCost, time.perf_counter() - startTime)
+        self._seeks += 1
+        return count
+
+    def _readFrame(self) -> tuple:
+        """
+        Return the next frame, in a buffer from the pool, and its timestamp,
+        or (None, None), for the resampler.
+        """
+        if self.isPrefetching:
+            with self._stats.stage("prefetchWait"):
+                frame, timestamp = self._startPrefetching().get()
+            if frame is not None:
+                self._sourceFramesElapsed += 1
+            return frame, timestamp
+        with self._stats.stage("grab"):
+            if not self._capture.grab():
+                return None, None
+            timestamp = time.perf_counter()
+            self._sourceFramesElapsed += 1
+        with self._stats.stage("retrieve"):
+            buffer = None
+            if self._frameShape is not None:
+                buffer = self._bufferPool.acquire(self._frameShape)
+            _, frame = self._capture.retrieve(buffer, self.channel)
+        if frame is not None and frame is not buffer:
+            self._bufferPool.release(buffer)
+            self._bufferPool.register(frame)
+            self._frameShape = frame.shape
+        return frame, None if frame is None else timestamp
+
+    def _startPrefetching(self) -> CapturePrefetcher:
+        """
+        Return the background prefetcher, starting it if necessary.
+        """
+        if self._prefetcher is None:
+            self._prefetcher = CapturePrefetcher(
+                self._capture,
+                self._prefetchSize,
+                self._prefetchPolicy,
+                self.channel,
+                self._bufferPool,
+                self._stats,
+            )
+            self._prefetcher.start()
+        return self._prefetcher
+
+    def _prefetchCounter(self, name: str) -> int:
+        count = self._prefetchCounters[name]
+        if self._prefetcher is not None:
+            count += getattr(self._prefetcher, name)
+        return count
+
+    def _stopPrefetching(self):
+        """
+        Stop the background prefetcher, if any, discarding prefetched frames.
+        """
+        if self._prefetcher is not None:
+            self._prefetcher.stop()
+            for name in self._prefetchCounters:
+                self._prefetchCounters[name] += getattr(self._prefetcher, name)
+            self._prefetcher = None
+
+    def release(self):
+        """
+        Stop any background work owned by the CaptureManager.
+        """
+        self._stopPrefetching()
+        if self._resampler is not None:
+            self._resampler.reset()
+        try:
+            self.stopWritingVideo()
+        finally:
+            self._imageWriter.close()
 
     def exitFrame(self):
         """
@@ -102,57 +557,231 @@ class CaptureManager(object):
 
         #
 
-        # Update the FPS estimate and related variables.
-        if self._framesElapsed == 0:
-            self._startTime = time.time()
-        else:
-            timeElapsed = time.time() - self._startTime
-            self._fpsEstimate = self._framesElapsed / timeElapsed
-            # print(self._fpsEstimate)
+        # Update the FPS estimate over the rolling window.
+        self._stats.addFrame(time.perf_counter())
+        self._fpsEstimate = self._stats.fps
         self._framesElapsed += 1
 
         # Draw to the window, if any.
         if self.previewWindowManager is not None:
-            if self.shouldMirrorPreview:
-                mirroredFrame = numpy.fliplr(self._frame)
-                self.previewWindowManager.show(mirroredFrame)
-            else:
-                self.previewWindowManager.show(self._frame)
+            with self._stats.stage("show"):
+                # Skip the mirroring when the display throttle skips the frame.
+                if self.shouldMirrorPreview and self.previewWindowManager.isFrameDue():
+                    mirroredFrame = self._acquireScratchBuffer(
+                        self._frame.shape, self._frame.dtype
+                    )
+                    cv2.flip(self._frame, 1, mirroredFrame)
+                    self.previewWindowManager.show(mirroredFrame)
+                else:
+                    self.previewWindowManager.show(self._frame)
 
         # Write to the image file, if any.
         if self.isWritingImage:
-            cv2.imwrite(self._imageFilename, self._frame)
-            self._imageFilename = None
+            with self._stats.stage("imageWrite"):
+                self._writeImageFrame()
 
         # Write to the video file, if any.
-        self._writeVideoFrame()
+        try:
+            if self.isWritingVideo:
+                with self._stats.stage("videoWrite"):
+                    self._writeVideoFrame()
+        finally:
+            # Release the frame, even if the video writer rejected it.
+            self._frame = None
+            self._enteredFrame = False
+            self._releaseBuffers()
 
-        # Release the frame.
-        self._frame = None
-        self._enteredFrame = False
+    def formatSampling(self) -> str:
+        """
+        Return a one-line summary of the frames kept from the capture, e.g.
+        while decimating: how many, at what rate, and how they were skipped.
+        """
+        fps = self._fpsEstimate
+        ratio = self._sourceFramesElapsed / max(self._framesElapsed, 1)
+        fpsText = "n/a" if fps is None else f"{fps:.1f} fps"
+        sourceFpsText = "n/a" if fps is None else f"{fps * ratio:.1f} fps"
+        return (
+            f"sampled {self._framesElapsed} of {self._sourceFramesElapsed} frames"
+            f" at {fpsText}, covering {sourceFpsText} of the capture,"
+            f" {self._seeks} seeks"
+        )
 
-    def writeImage(self, filename):
+    def presentFrame(
+        self,
+        frame: numpy.ndarray,
+        timestamp: float = None,
+        buffer: numpy.ndarray = None,
+    ):
+        """
+        Draw and write a frame captured elsewhere, e.g. by a FramePipeline, as
+        if it had been entered and exited here. The frame is used as it is:
+        apply regionOf() to it first.
+
+        The CaptureManager takes ownership of the pooled buffer that holds the
+        frame (by default the frame itself) and releases it.
+        """
+        if buffer is None:
+            buffer = frame
+        assert not self._enteredFrame, (
+            "presentFrame() called between enterFrame() and exitFrame()"
+        )
+        if self._frameBuffer is not None and not self._isFramePooled:
+            # Give back the buffer that enterFrame() would retrieve into.
+            self._bufferPool.release(self._frameBuffer)
+        self._frame = frame
+        self._frameBuffer = buffer
+        self._frameTimestamp = timestamp
+        self._enteredFrame = True
+        self.exitFrame()
+        # The video writer may have taken the buffer; otherwise return it.
+        if self._frameBuffer is buffer:
+            self._bufferPool.release(buffer)
+            self._frameBuffer = None
+
+    def regionOf(self, frame: numpy.ndarray) -> numpy.ndarray:
+        """
+        Return the region of interest of a full frame, resized to outputSize.
+
+        Without resizing, the result is the frame itself or a view of it, so
+        nothing is copied. A resized result is a new buffer from the pool,
+        which the caller must release. Safe to call from any thread.
+
+        Raise ValueError if the region of interest is not inside the frame.
+        """
+        if self._roi is not None:
+            x, y, width, height = self._roi
+            frameHeight, frameWidth = frame.shape[:2]
+            if x + width > frameWidth or y + height > frameHeight:
+                raise ValueError(
+                    f"region of interest {self._roi} is outside the "
+                    f"{frameWidth}x{frameHeight} frame"
+                )
+            if (x, y, width, height) != (0, 0, frameWidth, frameHeight):
+                frame = frame[y : y + height, x : x + width]
+        if self._outputSize is not None and self._outputSize != frame.shape[1::-1]:
+            width, height = self._outputSize
+            resizedFrame = self._bufferPool.acquire(
+                (height, width) + frame.shape[2:], frame.dtype
+            )
+            cv2.resize(frame, (width, height), resizedFrame)
+            frame = resizedFrame
+        return frame
+
+    def _applyRegion(self, frame: numpy.ndarray) -> numpy.ndarray:
+        region = self.regionOf(frame)
+        if region is not frame and region.base is None:
+            # A resized copy: release it with the frame.
+            self._scratchBuffers.append(region)
+        return region
+
+    @property
+    def _isFramePooled(self) -> bool:
+        """
+        Whether each frame has its own pooled buffer rather than reusing the
+        one that frame retrieves into.
+        """
+        return self.isPrefetching or self._resampler is not None
+
+    def _acquireScratchBuffer(self, shape: tuple, dtype) -> numpy.ndarray:
+        """
+        Return a pooled buffer that is released when the frame is exited.
+        """
+        buffer = self._bufferPool.acquire(shape, dtype)
+        self._scratchBuffers.append(buffer)
+        return buffer
+
+    def _releaseBuffers(self):
+        """
+        Return the frame buffer and any scratch buffers to the pool.
+        """
+        for buffer in self._scratchBuffers:
+            self._bufferPool.release(buffer)
+        self._scratchBuffers.clear()
+        if self._isFramePooled:
+            # Prefetched and resampled frames come from the pool, one per frame.
+            self._bufferPool.release(self._frameBuffer)
+            self._frameBuffer = None
+
+    def writeImage(self, filename, burstCount: int = 1):
         """
         Write the next exited frame to an image file.
+
+        With a burstCount above 1, write that many consecutive exited frames to
+        numbered files, e.g. screenshot_000.png, screenshot_001.png, ...
         """
+        if burstCount < 1:
+            raise ValueError(f"burst count must be at least 1, got {burstCount}")
         self._imageFilename = filename
+        self._imageBurstCount = burstCount
+        self._imageBurstIndex = 0
+
+    def _writeImageFrame(self):
+        """
+        Hand the next exited frame to the _imageWriter.
+        """
+        filename = self._imageFilename
+        if self._imageBurstCount > 1:
+            root, extension = os.path.splitext(filename)
+            digits = len(str(self._imageBurstCount - 1))
+            filename = f"{root}_{self._imageBurstIndex:0{digits}d}{extension}"
+        self._imageWriter.write(filename, self._frame)
+
+        self._imageBurstIndex += 1
+        if self._imageBurstIndex >= self._imageBurstCount:
+            self._imageFilename = None
 
     def startWritingVideo(
-        self, filename, encoding=cv2.VideoWriter_fourcc("M", "J", "P", "G")
+        self,
+        filename,
+        encoding=cv2.VideoWriter_fourcc("M", "J", "P", "G"),
+        queueSize: int = 8,
+        backpressure: str = "block",
+        lockToTimeline: bool = None,
+        fps: float = None,
     ):
         """
         Start writing exited frames to a video file.
+
+        Frames are encoded on a worker thread. When more than queueSize frames are
+        waiting, backpressure ("drop", "block" or "spill") decides what happens.
+
+        With lockToTimeline, frames are duplicated or dropped by their capture
+        timestamps so that the video plays back in real time. By default this is
+        done only when the capture does not report its FPS, e.g. some cameras.
+
+        :param fps: the video's FPS (default: the capture's, or else estimated
+            from the timestamps of the first frames)
         """
+        if backpressure not in AsyncVideoWriter.POLICIES:
+            raise ValueError(
+                f"backpressure must be one of {AsyncVideoWriter.POLICIES}, "
+                f"got {backpressure!r}"
+            )
         self._videoFilename = filename
         self._videoEncoding = encoding
+        self._videoQueueSize = queueSize
+        self._videoBackpressure = backpressure
+        self._videoLockToTimeline = lockToTimeline
+        self._videoFps = fps
 
     def stopWritingVideo(self):
         """
         Stop writing exited frames to a video file.
+
+        Block until every queued frame has been encoded and the file is closed.
         """
-        self._videoFilename = None
-        self._videoEncoding = None
-        self._videoWriter = None
+        try:
+            if self._videoWriter is not None:
+                # Raises any error that stopped the writer's worker.
+                self._videoWriter.close()
+        finally:
+            self._videoFilename = None
+            self._videoEncoding = None
+            self._videoQueueSize = None
+            self._videoBackpressure = None
+            self._videoLockToTimeline = None
+            self._videoFps = None
+            self._videoWriter = None
 
     def _writeVideoFrame(self):
         """
@@ -162,31 +791,57 @@ class CaptureManager(object):
             return
 
         if self._videoWriter is None:
-            fps = self._capture.get(cv2.CAP_PROP_FPS)
+            fps = self._videoFps or self._capture.get(cv2.CAP_PROP_FPS)
+            lockToTimeline = self._videoLockToTimeline
             if fps <= 0.0:
-                # The capture's FPS is unknown so use an estimate.
-                if self._framesElapsed < 20:
-                    # Wait until more frames elapse so that the
-                    # estimate is more stable.
-                    return
-                else:
-                    fps = self._fpsEstimate
-            size = (
-                int(self._capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
-                int(self._capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                # The capture's FPS is unknown, so the writer estimates it from
+                # the timestamps of the first frames, which it holds back.
+                fps = None
+                if lockToTimeline is None:
+                    lockToTimeline = True
+            # Use the exited frame's size, which differs from the capture's
+            # once the frame has been cropped or resized.
+            height, width = self._frame.shape[:2]
+            size = (width, height)
+            self._videoWriter = AsyncVideoWriter(
+                self._videoFilename,
+                self._videoEncoding,
+                fps,
+                size,
+                self._videoQueueSize,
+                self._videoBackpressure,
+                self._bufferPool,
+                bool(lockToTimeline),
             )
-            self._videoWriter = cv2.VideoWriter(
-                self._videoFilename, self._videoEncoding, fps, size
-            )
-
-        self._videoWriter.write(self._frame)
+            self._videoWriter.start()
+
+        # The writer returns its frame to the pool once encoded. Hand over the
+        # frame buffer or a scratch buffer when possible; otherwise copy the
+        # frame (e.g. a view of the region of interest) into a pooled one.
+        scratchIndex = next(
+            (
+                i
+                for i, buffer in enumerate(self._scratchBuffers)
+                if buffer is self._frame
+            ),
+            None,
+        )
+        if self._frame is self._frameBuffer:
+            frame = self._frameBuffer
+            self._frameBuffer = None
+        elif scratchIndex is not None:
+            frame = self._scratchBuffers.pop(scratchIndex)
+        else:
+            frame = self._bufferPool.acquire(self._frame.shape, self._frame.dtype)
+            numpy.copyto(frame, self._frame)
+        self._videoWriter.write(frame, self._frameTimestamp)
 
     # ==================================================================================================
     # I will expand CaptureManager to support custom features
     # for example:
     # - a method to set the videos resolution
     # - a method to set the video start frame
-    # - a method to slow down the video speed by inserting frames
+    # - a method to slow down the video speed by inserting frames (see resampler)
 
     def jumpToFrame(self, start_frame: int) -> bool:
         """
@@ -201,7 +856,10 @@ class CaptureManager(object):
             return False
 
         # 获取视频的总帧数
-        total_frames = int(self._capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        if self._seekIndex is not None:
+            total_frames = self._seekIndex.frameCount
+        else:
+            total_frames = int(self._capture.get(cv2.CAP_PROP_FRAME_COUNT))
         if start_frame < 0 or start_frame >= total_frames:
             print(
                 f"Error: Target frame {start_frame} is out of range (0 to {total_frames - 1})."
@@ -209,7 +867,18 @@ class CaptureManager(object):
             return False
 
         # 跳转到指定帧
-        self._capture.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        self._stopPrefetching()
+        if self._resampler is not None:
+            self._resampler.reset()
+        if self._seekIndex is None:
+            self._capture.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        else:
+            # Land on the preceding keyframe, then decode forward to the target.
+            keyframe = self._seekIndex.keyframeBefore(start_frame)
+            self._capture.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+            for _ in range(start_frame - keyframe):
+                if not self._capture.grab():
+                    break
 
         # 验证是否成功跳转
         current_frame = int(self._capture.get(cv2.CAP_PROP_POS_FRAMES))
@@ -221,6 +890,16 @@ class CaptureManager(object):
             )
             return False
 
+    def useSeekIndex(self, videoPath: str) -> SeekIndex:
+        """
+        Make jumpToFrame() seek via the keyframe index of the captured file.
+
+        The index is read from a sidecar file next to the video, or built by a
+        first scan of the file and saved there.
+        """
+        self._seekIndex = SeekIndex.load(videoPath)
+        return self._seekIndex
+
     def cropFrame(self, x, y, h, w):
         """
         Crop the frame to the specified size.
@@ -231,4 +910,11 @@ class CaptureManager(object):
         """
         Adjust the resolution of the video.
         """
-        self._frame = cv2.resize(self._frame, (width, height))
+        resizedFrame = self._acquireScratchBuffer(
+            (height, width) + self._frame.shape[2:], self._frame.dtype
+        )
+        self._frame = cv2.resize(self._frame, (width, height), resizedFrame)
+
+
+def _movingAverage(average: float, sample: float, weight: float = 0.2) -> float:
+    return sample if average is None else average + weight * (sample - average)
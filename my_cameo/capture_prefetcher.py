@@ -0,0 +1,174 @@
+import cv2
+import threading
+import time
+import collections
+from buffer_pool import BufferPool
+from frame_stats import FrameStats
+
+
+class CapturePrefetcher(threading.Thread):
+    """
+    A background thread that grabs and retrieves frames ahead of the consumer.
+
+    Decoded frames are kept, with the time they were grabbed, in a small bounded ring. When the ring is full,
+    the "drop" policy discards the oldest frame and the "block" policy makes
+    the grabber wait for the consumer.
+    """
+
+    POLICIES = ("drop", "block")
+
+    def __init__(
+        self,
+        capture: cv2.VideoCapture,
+        size: int = 2,
+        policy: str = "drop",
+        channel: int = 0,
+        bufferPool: BufferPool = None,
+        stats: FrameStats = None,  # records the "grab" and "retrieve" stages
+    ):
+        super().__init__(daemon=True)
+        if size < 1:
+            raise ValueError(f"prefetch size must be at least 1, got {size}")
+        if policy not in self.POLICIES:
+            raise ValueError(
+                f"prefetch policy must be one of {self.POLICIES}, got {policy!r}"
+            )
+
+        self._capture: cv2.VideoCapture = capture
+        self._size: int = size
+        self._policy: str = policy
+        self._channel: int = channel
+        self._bufferPool: BufferPool = bufferPool
+        self._frameShape: tuple = None
+        self._stats: FrameStats = stats
+
+        self._ring: collections.deque = collections.deque()
+        self._condition = threading.Condition()
+        self._isStopping: bool = False
+        self._isExhausted: bool = False
+
+        # counters for pipeline saturation
+        self._droppedFrames: int = 0
+        self._grabberStalls: int = 0
+        self._consumerStalls: int = 0
+        self._busyTime: float = 0.0
+        self._maxQueuedFrames: int = 0
+
+    # ==================================================================================================
+    # The CapturePrefetcher class has the following properties:
+
+    @property
+    def droppedFrames(self) -> int:
+        """Frames discarded because the consumer fell behind ("drop" policy)."""
+        return self._droppedFrames
+
+    @property
+    def grabberStalls(self) -> int:
+        """Times the grabber waited for a free slot ("block" policy)."""
+        return self._grabberStalls
+
+    @property
+    def consumerStalls(self) -> int:
+        """Times the consumer waited because the ring was empty."""
+        return self._consumerStalls
+
+    @property
+    def queuedFrames(self) -> int:
+        return len(self._ring)
+
+    @property
+    def maxQueuedFrames(self) -> int:
+        return self._maxQueuedFrames
+
+    @property
+    def busyTime(self) -> float:
+        """Seconds spent grabbing and retrieving frames."""
+        return self._busyTime
+
+    # ==================================================================================================
+    # The CapturePrefetcher class has the following methods:
+
+    def run(self):
+        while not self._isStopping:
+            startTime = time.perf_counter()
+            if not self._capture.grab():
+                break
+            timestamp = time.perf_counter()
+            frame = self._retrieve()
+            stopTime = time.perf_counter()
+            self._busyTime += stopTime - startTime
+            if self._stats is not None:
+                self._stats.addSample("grab", timestamp - startTime)
+                self._stats.addSample("retrieve", stopTime - timestamp)
+            if frame is None:
+                break
+
+            with self._condition:
+                if self._policy == "block":
+                    if len(self._ring) >= self._size and not self._isStopping:
+                        self._grabberStalls += 1
+                    while len(self._ring) >= self._size and not self._isStopping:
+                        self._condition.wait()
+                while len(self._ring) >= self._size:
+                    self._release(self._ring.popleft()[0])
+                    self._droppedFrames += 1
+                self._ring.append((frame, timestamp))
+                self._maxQueuedFrames = max(self._maxQueuedFrames, len(self._ring))
+                self._condition.notify_all()
+
+        with self._condition:
+            self._isExhausted = True
+            self._condition.notify_all()
+
+    def get(self) -> tuple:
+        """
+        Return the oldest prefetched frame and its grab time (time.perf_counter()),
+        waiting for one if necessary.
+
+        Return (None, None) once the capture is exhausted and the ring is empty.
+        """
+        with self._condition:
+            if not self._ring and not self._isExhausted:
+                self._consumerStalls += 1
+            while not self._ring and not self._isExhausted:
+                self._condition.wait()
+            if not self._ring:
+                return None, None
+            frame, timestamp = self._ring.popleft()
+            self._condition.notify_all()
+            return frame, timestamp
+
+    def stop(self):
+        """
+        Stop grabbing, discard any prefetched frames and join the thread.
+        """
+        with self._condition:
+            self._isStopping = True
+            self._condition.notify_all()
+        if self.is_alive():
+            self.join()
+        # Another thread, e.g. a FramePipeline's process stage, may still be
+        # taking frames with get().
+        with self._condition:
+            while self._ring:
+                self._release(self._ring.popleft()[0])
+            self._condition.notify_all()
+
+    def _retrieve(self) -> cv2.typing.MatLike:
+        if self._bufferPool is None:
+            _, frame = self._capture.retrieve(None, self._channel)
+            return frame
+
+        buffer = None
+        if self._frameShape is not None:
+            buffer = self._bufferPool.acquire(self._frameShape)
+        _, frame = self._capture.retrieve(buffer, self._channel)
+        if frame is not None and frame is not buffer:
+            self._bufferPool.release(buffer)
+            self._bufferPool.register(frame)
+            self._frameShape = frame.shape
+        return frame
+
+    def _release(self, frame: cv2.typing.MatLike):
+        if self._bufferPool is not None:
+            self._bufferPool.release(frame)
@@ -30,10 +30,15 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
+import collections
+import time
+
 import cv2
 import numpy
 
 import utils
+from buffer_pool import sharedPool
+from tile_executor import sharedExecutor
 
 
 def recolorRC(src, dst):
@@ -50,9 +55,7 @@ def recolorRC(src, dst):
     dst.r = src.r
 
     """
-    b, g, r = cv2.split(src)
-    cv2.addWeighted(b, 0.5, g, 0.5, 0, b)
-    cv2.merge((b, b, r), dst)
+    cv2.transform(src, _RC_MATRIX, dst)
 
 
 def recolorRGV(src, dst):
@@ -69,10 +72,7 @@ def recolorRGV(src, dst):
     dst.r = src.r
 
     """
-    b, g, r = cv2.split(src)
-    cv2.min(b, g, b)
-    cv2.min(b, r, b)
-    cv2.merge((b, g, r), dst)
+    _reduceIntoBlue(numpy.minimum, src, dst)
 
 
 def recolorCMV(src, dst):
@@ -89,59 +89,177 @@ def recolorCMV(src, dst):
     dst.r = src.r
 
     """
-    b, g, r = cv2.split(src)
-    cv2.max(b, g, b)
-    cv2.max(b, r, b)
-    cv2.merge((b, g, r), dst)
-
-
-def blend(foregroundSrc, backgroundSrc, dst, alphaMask):
-    # Calculate the normalized alpha mask.
-    maxAlpha = numpy.iinfo(alphaMask.dtype).max
-    normalizedAlphaMask = (1.0 / maxAlpha) * alphaMask
-
-    # Calculate the normalized inverse alpha mask.
-    normalizedInverseAlphaMask = numpy.ones_like(normalizedAlphaMask)
-    normalizedInverseAlphaMask[:] = normalizedInverseAlphaMask - normalizedAlphaMask
-
-    # Split the channels from the sources.
-    foregroundChannels = cv2.split(foregroundSrc)
-    backgroundChannels = cv2.split(backgroundSrc)
-
-    # Blend each channel.
-    numChannels = len(foregroundChannels)
-    i = 0
-    while i < numChannels:
-        backgroundChannels[i][:] = (
-            normalizedAlphaMask * foregroundChannels[i]
-            + normalizedInverseAlphaMask * backgroundChannels[i]
-        )
-        i += 1
+    _reduceIntoBlue(numpy.maximum, src, dst)
+
+
+# Each output channel as a weighted sum of the input (b, g, r).
+_RC_MATRIX = numpy.array(
+    [[0.5, 0.5, 0.0], [0.5, 0.5, 0.0], [0.0, 0.0, 1.0]], numpy.float32
+)
+
+
+def _reduceIntoBlue(ufunc, src, dst):
+    """Set dst to src with its blue channel replaced by ufunc of b, g and r.
+
+    The reduction reads the channel views of src and writes the blue view
+    of dst, so it also works in place.
+
+    """
+    if dst is not src:
+        numpy.copyto(dst, src)
+    blue = dst[..., 0]
+    ufunc(src[..., 0], src[..., 1], out=blue)
+    ufunc(blue, src[..., 2], out=blue)
 
-    # Merge the blended channels into the destination.
-    cv2.merge(backgroundChannels, dst)
+
+class BlendMask(object):
+    """An alpha mask prepared for blend(), reusable for static overlays.
+
+    The mask and its inverse are stored as fixed-point integers wide enough
+    for alpha * pixel, e.g. uint16 for a uint8 mask over uint8 images.
+
+    """
+
+    def __init__(self, alphaMask, imageDtype=numpy.uint8):
+        self.maxAlpha = int(numpy.iinfo(alphaMask.dtype).max)
+        maxProduct = self.maxAlpha * int(numpy.iinfo(imageDtype).max)
+        # Room for fg * alpha + bg * (maxAlpha - alpha) plus the rounding term.
+        self.dtype = numpy.min_scalar_type(maxProduct + self.maxAlpha)
+        self.alpha = alphaMask.astype(self.dtype)
+        self.inverseAlpha = (self.maxAlpha - alphaMask).astype(self.dtype)
+        self._channelMasks = {}
+
+    def forChannels(self, numChannels):
+        """Return the mask and its inverse repeated across numChannels.
+
+        Contiguous per-channel masks are much faster to multiply by than a
+        broadcast mask, so they are built once and kept.
+
+        """
+        if numChannels == 1:
+            return self.alpha, self.inverseAlpha
+        if numChannels not in self._channelMasks:
+            self._channelMasks[numChannels] = (
+                numpy.repeat(self.alpha[..., numpy.newaxis], numChannels, axis=2),
+                numpy.repeat(
+                    self.inverseAlpha[..., numpy.newaxis], numChannels, axis=2
+                ),
+            )
+        return self._channelMasks[numChannels]
+
+
+def blend(foregroundSrc, backgroundSrc, dst, alphaMask, numTiles=1, executor=None):
+    """Blend a foreground over a background into dst, using an alpha mask.
+
+    The alpha mask is an integer array with one value per pixel, or a
+    BlendMask built from one. The blend is computed in integer arithmetic on
+    all channels at once, and is rounded to the nearest value. With
+    numTiles > 1, bands of rows are blended in parallel on a TileExecutor
+    (default: the shared one).
+
+    """
+    if not isinstance(alphaMask, BlendMask):
+        alphaMask = BlendMask(alphaMask, foregroundSrc.dtype)
+    numChannels = 1 if utils.isGray(foregroundSrc) else foregroundSrc.shape[2]
+    alpha, inverseAlpha = alphaMask.forChannels(numChannels)
+    if executor is None:
+        executor = sharedExecutor
+    executor.forEachBand(
+        lambda rows: _blendRows(
+            foregroundSrc[rows],
+            backgroundSrc[rows],
+            dst[rows],
+            alpha[rows],
+            inverseAlpha[rows],
+            alphaMask.maxAlpha,
+        ),
+        dst.shape[0],
+        numTiles,
+    )
+
+
+def _blendRows(foregroundSrc, backgroundSrc, dst, alpha, inverseAlpha, maxAlpha):
+    blended = sharedPool.acquire(foregroundSrc.shape, alpha.dtype)
+    scratch = sharedPool.acquire(foregroundSrc.shape, alpha.dtype)
+    numpy.multiply(foregroundSrc, alpha, out=blended)
+    numpy.multiply(backgroundSrc, inverseAlpha, out=scratch)
+    blended += scratch
+    # Divide by maxAlpha, rounding to the nearest value.
+    if maxAlpha == 255:
+        # round(x / 255) == (y + (y >> 8)) >> 8 with y = x + 128, for x <= 255 * 255.
+        blended += 128
+        numpy.right_shift(blended, 8, out=scratch)
+        blended += scratch
+        blended >>= 8
+    else:
+        blended += maxAlpha // 2
+        blended //= maxAlpha
+    numpy.copyto(dst, blended, casting="unsafe")
+    sharedPool.release(scratch)
+    sharedPool.release(blended)
 
 
-def strokeEdges(src, dst, blurKsize=7, edgeKsize=5):
+def strokeEdges(src, dst, blurKsize=7, edgeKsize=5, downscaleEdges=False):
     """Apply a filter that detects edges and then strokes them.
 
+    Every intermediate image is 8-bit and comes from the shared buffer pool,
+    and src may be dst.
+
     Args:
         src (_type_): _description_
         dst (_type_): _description_
         blurKsize (int, optional): _description_. Defaults to 7.
         edgeKsize (int, optional): _description_. Defaults to 5.
+        downscaleEdges (bool, optional): Run the median blur and the
+            Laplacian at half resolution, then upsample the edges.
+            Defaults to False.
     """
+    height, width = src.shape[:2]
+    if downscaleEdges:
+        edgeSize = ((width + 1) // 2, (height + 1) // 2)
+        edgeSrc = sharedPool.acquire(edgeSize[::-1] + src.shape[2:], src.dtype)
+        cv2.resize(src, edgeSize, edgeSrc, interpolation=cv2.INTER_AREA)
+    else:
+        edgeSrc = src
+
+    graySrc = sharedPool.acquire(edgeSrc.shape[:2], src.dtype)
     if blurKsize >= 3:
-        blurredSrc = cv2.medianBlur(src, blurKsize)
-        graySrc = cv2.cvtColor(blurredSrc, cv2.COLOR_BGR2GRAY)
+        blurredSrc = sharedPool.acquire(edgeSrc.shape, src.dtype)
+        cv2.medianBlur(edgeSrc, blurKsize, blurredSrc)
+        cv2.cvtColor(blurredSrc, cv2.COLOR_BGR2GRAY, graySrc)
+        sharedPool.release(blurredSrc)
     else:
-        graySrc = cv2.cvtColor(src, cv2.COLOR_BGR2GRAY)
+        cv2.cvtColor(edgeSrc, cv2.COLOR_BGR2GRAY, graySrc)
     cv2.Laplacian(graySrc, cv2.CV_8U, graySrc, ksize=edgeKsize)
-    normalizedInverseAlpha = (1.0 / 255) * (255 - graySrc)
-    channels = cv2.split(src)
-    for channel in channels:
-        channel[:] = channel * normalizedInverseAlpha
-    cv2.merge(channels, dst)
+
+    # The inverse alpha, 255 - edges, scaled by 1/255 inside cv2.multiply.
+    cv2.bitwise_not(graySrc, graySrc)
+    if downscaleEdges:
+        sharedPool.release(edgeSrc)
+        inverseAlpha = sharedPool.acquire((height, width), src.dtype)
+        cv2.resize(graySrc, (width, height), inverseAlpha)
+        sharedPool.release(graySrc)
+    else:
+        inverseAlpha = graySrc
+    bgrInverseAlpha = sharedPool.acquire(src.shape, src.dtype)
+    cv2.cvtColor(inverseAlpha, cv2.COLOR_GRAY2BGR, bgrInverseAlpha)
+    cv2.multiply(src, bgrInverseAlpha, dst, scale=1.0 / 255)
+    sharedPool.release(bgrInverseAlpha)
+    sharedPool.release(inverseAlpha)
+
+
+def strokeEdgesHalo(blurKsize=7, edgeKsize=5, downscaleEdges=False):
+    """Return the rows of context strokeEdges needs around a band of rows.
+
+    With downscaleEdges, tiled results are close to, not exactly, the
+    untiled ones, because the half-resolution rows may fall differently.
+
+    """
+    halo = (blurKsize // 2 if blurKsize >= 3 else 0) + edgeKsize // 2
+    if downscaleEdges:
+        # Twice the rows at half resolution, plus the resizes' own reach.
+        halo = 2 * halo + 2
+    return halo
 
 
 class VFuncFilter(object):
@@ -153,6 +271,11 @@ class VFuncFilter(object):
 
     def apply(self, src, dst):
         """Apply the filter with a BGR or gray source/destination."""
+        if self._vLookupArray is None:
+            return
+        if self._vLookupArray.dtype == numpy.uint8 and src.dtype == numpy.uint8:
+            cv2.LUT(src, self._vLookupArray, dst)
+            return
         srcFlatView = numpy.ravel(src)
         dstFlatView = numpy.ravel(dst)
         utils.applyLookupArray(self._vLookupArray, srcFlatView, dstFlatView)
@@ -162,7 +285,8 @@ class VCurveFilter(VFuncFilter):
     """A filter that applies a curve to V (or all of BGR)."""
 
     def __init__(self, vPoints, dtype=numpy.uint8):
-        VFuncFilter.__init__(self, utils.createCurveFunc(vPoints), dtype)
+        length = numpy.iinfo(dtype).max + 1
+        self._vLookupArray = utils.createCurveLookupArray(vPoints, length=length)
 
 
 class BGRFuncFilter(object):
@@ -172,23 +296,32 @@ class BGRFuncFilter(object):
         self, vFunc=None, bFunc=None, gFunc=None, rFunc=None, dtype=numpy.uint8
     ):
         length = numpy.iinfo(dtype).max + 1
-        self._bLookupArray = utils.createLookupArray(
-            utils.createCompositeFunc(bFunc, vFunc), length
+        self._setLookupArrays(
+            utils.createLookupArray(utils.createCompositeFunc(bFunc, vFunc), length),
+            utils.createLookupArray(utils.createCompositeFunc(gFunc, vFunc), length),
+            utils.createLookupArray(utils.createCompositeFunc(rFunc, vFunc), length),
         )
-        self._gLookupArray = utils.createLookupArray(
-            utils.createCompositeFunc(gFunc, vFunc), length
-        )
-        self._rLookupArray = utils.createLookupArray(
-            utils.createCompositeFunc(rFunc, vFunc), length
+
+    def _setLookupArrays(self, bLookupArray, gLookupArray, rLookupArray):
+        self._bLookupArray = bLookupArray
+        self._gLookupArray = gLookupArray
+        self._rLookupArray = rLookupArray
+        self._bgrLookupTable = utils.createBGRLookupTable(
+            bLookupArray, gLookupArray, rLookupArray
         )
 
     def apply(self, src, dst):
         """Apply the filter with a BGR source/destination."""
-        b, g, r = cv2.split(src)
-        utils.applyLookupArray(self._bLookupArray, b, b)
-        utils.applyLookupArray(self._gLookupArray, g, g)
-        utils.applyLookupArray(self._rLookupArray, r, r)
-        # cv2.merge([b, g, r], dst)
+        if self._bgrLookupTable is not None and src.dtype == numpy.uint8:
+            # One pass over all three channels, straight from src to dst.
+            cv2.LUT(src, self._bgrLookupTable, dst)
+            return
+        lookupArrays = (self._bLookupArray, self._gLookupArray, self._rLookupArray)
+        for i, lookupArray in enumerate(lookupArrays):
+            if lookupArray is not None:
+                utils.applyLookupArray(lookupArray, src[..., i], dst[..., i])
+            elif dst is not src:
+                dst[..., i] = src[..., i]
 
 
 class BGRCurveFilter(BGRFuncFilter):
@@ -197,13 +330,11 @@ class BGRCurveFilter(BGRFuncFilter):
     def __init__(
         self, vPoints=None, bPoints=None, gPoints=None, rPoints=None, dtype=numpy.uint8
     ):
-        BGRFuncFilter.__init__(
-            self,
-            utils.createCurveFunc(vPoints),
-            utils.createCurveFunc(bPoints),
-            utils.createCurveFunc(gPoints),
-            utils.createCurveFunc(rPoints),
-            dtype,
+        length = numpy.iinfo(dtype).max + 1
+        self._setLookupArrays(
+            utils.createCurveLookupArray(bPoints, vPoints, length),
+            utils.createCurveLookupArray(gPoints, vPoints, length),
+            utils.createCurveLookupArray(rPoints, vPoints, length),
         )
 
 
@@ -262,14 +393,43 @@ class BGRVelviaCurveFilter(BGRCurveFilter):
 
 
 class VConvolutionFilter(object):
-    """A filter that applies a convolution to V (or all of BGR)."""
+    """
+    A filter that applies a convolution to V (or all of BGR).
+
+    The kernel is analysed once, at construction: a uniform kernel that sums
+    to 1 runs as a box blur, a rank-1 kernel as separable row and column
+    passes, and any other kernel as a general float32 cv2.filter2D.
+    """
 
     def __init__(self, kernel):
-        self._kernel = kernel
+        self._kernel = numpy.asarray(kernel, numpy.float32)
+        self._rowKernel = None
+        self._columnKernel = None
+        self.method = "filter2D"
+        # Rows of context needed above and below a band, for TiledFilter.
+        self.halo = self._kernel.shape[0] // 2
+
+        if self._kernel.size > 1 and numpy.ptp(self._kernel) == 0:
+            if numpy.isclose(self._kernel.sum(), 1.0, rtol=1e-5):
+                self.method = "box"
+        if self.method == "filter2D" and min(self._kernel.shape) > 1:
+            # A rank-1 kernel is the outer product of a column and a row.
+            u, s, vt = numpy.linalg.svd(self._kernel.astype(numpy.float64))
+            if s[0] > 0.0 and s[1] <= 1e-6 * s[0]:
+                scale = numpy.sqrt(s[0])
+                self._columnKernel = (u[:, 0] * scale).astype(numpy.float32)
+                self._rowKernel = (vt[0] * scale).astype(numpy.float32)
+                self.method = "separable"
 
     def apply(self, src, dst):
         """Apply the filter with a BGR or gray source/destination."""
-        cv2.filter2D(src, -1, self._kernel, dst)
+        if self.method == "box":
+            height, width = self._kernel.shape
+            cv2.blur(src, (width, height), dst)
+        elif self.method == "separable":
+            cv2.sepFilter2D(src, -1, self._rowKernel, self._columnKernel, dst)
+        else:
+            cv2.filter2D(src, -1, self._kernel, dst)
 
 
 class BlurFilter(VConvolutionFilter):
@@ -310,3 +470,264 @@ class EmbossFilter(VConvolutionFilter):
     def __init__(self):
         kernel = numpy.array([[-2, -1, 0], [-1, 1, 1], [0, 1, 2]])
         VConvolutionFilter.__init__(self, kernel)
+
+
+class _LookupStage(object):
+    """Several lookup filters composed into one table, applied in one pass."""
+
+    def __init__(self, table, numFilters):
+        self._table = table
+        self.numFilters = numFilters
+
+    def apply(self, src, dst):
+        cv2.LUT(src, self._table, dst)
+
+
+class FilterPipeline(object):
+    """A sequence of filters, with adjacent 8-bit lookup filters fused.
+
+    Filters are filter instances (with an apply(src, dst) method) or
+    functions such as strokeEdges(src, dst). Runs of VFuncFilter,
+    BGRFuncFilter and their curve subclasses are composed into a single
+    table when the pipeline is built, so N stacked colour grades cost one
+    pass over the frame. Any other filter is a boundary between runs.
+
+    """
+
+    def __init__(self, filters):
+        self._filters = list(filters)
+        self._stages = []
+        run = []
+        for stageFilter in self._filters:
+            if _lookupTableOf(stageFilter) is not None:
+                run.append(stageFilter)
+                continue
+            self._appendLookupRun(run)
+            run = []
+            self._stages.append(stageFilter)
+        self._appendLookupRun(run)
+
+    @property
+    def numFilters(self):
+        return len(self._filters)
+
+    @property
+    def numPasses(self):
+        """The number of passes over the frame that apply() makes."""
+        return len(self._stages)
+
+    @property
+    def passesSaved(self):
+        return self.numFilters - self.numPasses
+
+    @property
+    def halo(self):
+        """The rows of context the whole sequence needs around a band."""
+        return sum(_haloOf(stage) for stage in self._stages)
+
+    def apply(self, src, dst):
+        """Apply every filter in order, from src into dst."""
+        if not self._stages:
+            if dst is not src:
+                numpy.copyto(dst, src)
+            return
+        for i, stage in enumerate(self._stages):
+            stageSrc = src if i == 0 else dst
+            if hasattr(stage, "apply"):
+                stage.apply(stageSrc, dst)
+            else:
+                stage(stageSrc, dst)
+
+    def _appendLookupRun(self, run):
+        if len(run) == 1:
+            self._stages.append(run[0])
+        elif run:
+            tables = [_lookupTableOf(runFilter) for runFilter in run]
+            self._stages.append(_LookupStage(_composeLookupTables(tables), len(run)))
+
+
+def _haloOf(stageFilter):
+    """Return the rows of context a filter needs around a band of rows."""
+    if stageFilter is strokeEdges:
+        return strokeEdgesHalo()
+    return getattr(stageFilter, "halo", 0)
+
+
+class TiledFilter(object):
+    """A filter applied band by band in parallel on a TileExecutor.
+
+    Wraps a filter instance or function, e.g. a FilterPipeline or
+    recolorRC. The halo (rows of context around each band) defaults to
+    the filter's own: 0 for per-pixel filters, kernelHeight // 2 for a
+    VConvolutionFilter. Pass it explicitly for strokeEdges with custom
+    kernel sizes, see strokeEdgesHalo().
+
+    """
+
+    def __init__(self, stageFilter, halo=None, numTiles=None, executor=None):
+        self._filter = stageFilter
+        self.halo = _haloOf(stageFilter) if halo is None else halo
+        self.numTiles = numTiles
+        self._executor = sharedExecutor if executor is None else executor
+        if hasattr(stageFilter, "apply"):
+            self._apply = stageFilter.apply
+        else:
+            self._apply = stageFilter
+
+    def apply(self, src, dst):
+        """Apply the filter, band by band, from src into dst."""
+        self._executor.apply(self._apply, src, dst, self.halo, self.numTiles)
+
+
+class AdaptiveFilter(object):
+    """A filter that trades resolution for speed when it runs over budget.
+
+    The wrapped filter's cost, including any resizing, is measured on every
+    frame. When its mean over the last windowSize frames goes over budget
+    seconds, the filter steps down to the next of scales: it runs on a
+    downscaled copy of the frame and the result is upscaled into dst. When
+    the cost predicted for the next larger scale (cost grows with the pixel
+    count) fits within headroom * budget, it steps back up. With
+    skipAlternateFrames, one last step below the smallest scale filters
+    only every other frame and passes the others through unfiltered.
+
+    """
+
+    SCALES = (1.0, 0.75, 0.5, 0.375, 0.25)
+
+    def __init__(
+        self,
+        stageFilter,
+        budget=1.0 / 30,
+        scales=SCALES,
+        windowSize=10,
+        headroom=0.7,
+        skipAlternateFrames=False,
+    ):
+        if hasattr(stageFilter, "apply"):
+            self._apply = stageFilter.apply
+        else:
+            self._apply = stageFilter
+        self.budget = budget
+        self.headroom = headroom
+        self._scales = tuple(scales)
+        self._numLevels = len(self._scales) + (1 if skipAlternateFrames else 0)
+        self._level = 0
+        self._costs = collections.deque(maxlen=windowSize)
+        self._frameIndex = 0
+        self._degradedFrames = 0
+        self._skippedFrames = 0
+
+    @property
+    def scale(self):
+        """The scale the filter currently runs at, 1.0 for full resolution."""
+        return self._scales[min(self._level, len(self._scales) - 1)]
+
+    @property
+    def isSkippingFrames(self):
+        return self._level >= len(self._scales)
+
+    @property
+    def degradedFrames(self):
+        """Frames filtered below full resolution or not filtered at all."""
+        return self._degradedFrames
+
+    @property
+    def skippedFrames(self):
+        """Frames passed through unfiltered."""
+        return self._skippedFrames
+
+    @property
+    def frameCost(self):
+        """The mean seconds per filtered frame over the window, or None."""
+        if not self._costs:
+            return None
+        return sum(self._costs) / len(self._costs)
+
+    def apply(self, src, dst):
+        """Apply the filter at the current scale, from src into dst."""
+        self._frameIndex += 1
+        if self.isSkippingFrames and self._frameIndex % 2 == 0:
+            if dst is not src:
+                numpy.copyto(dst, src)
+            self._skippedFrames += 1
+            self._degradedFrames += 1
+            return
+
+        startTime = time.perf_counter()
+        scale = self.scale
+        if scale >= 1.0:
+            self._apply(src, dst)
+        else:
+            height, width = src.shape[:2]
+            scaledSize = (
+                max(1, int(round(width * scale))),
+                max(1, int(round(height * scale))),
+            )
+            scaledSrc = sharedPool.acquire(scaledSize[::-1] + src.shape[2:], src.dtype)
+            cv2.resize(src, scaledSize, scaledSrc, interpolation=cv2.INTER_AREA)
+            self._apply(scaledSrc, scaledSrc)
+            cv2.resize(scaledSrc, (width, height), dst)
+            sharedPool.release(scaledSrc)
+            self._degradedFrames += 1
+        self._costs.append(time.perf_counter() - startTime)
+        self._adapt()
+
+    def formatStatus(self):
+        """Return a one-line summary of the scale and the degraded frames."""
+        cost = self.frameCost
+        costText = "n/a" if cost is None else f"{cost * 1e3:.1f} ms"
+        return (
+            f"scale {self.scale:.3g}{' (skipping)' if self.isSkippingFrames else ''},"
+            f" {self._degradedFrames} degraded frames ({self._skippedFrames} skipped),"
+            f" cost {costText} / budget {self.budget * 1e3:.1f} ms"
+        )
+
+    def _adapt(self):
+        # Decide only on a full window of frames at the current level.
+        if len(self._costs) < self._costs.maxlen:
+            return
+        cost = self.frameCost
+        if cost > self.budget:
+            if self._level < self._numLevels - 1:
+                self._level += 1
+                self._costs.clear()
+        elif self._level > 0:
+            scale = self.scale
+            largerScale = self._scales[self._level - 1]
+            predictedCost = cost * (largerScale / scale) ** 2
+            if predictedCost <= self.headroom * self.budget:
+                self._level -= 1
+                self._costs.clear()
+
+
+def _lookupTableOf(stageFilter):
+    """Return a filter's 8-bit cv2.LUT table, or None if it cannot be fused."""
+    if isinstance(stageFilter, BGRFuncFilter):
+        return stageFilter._bgrLookupTable
+    if isinstance(stageFilter, VFuncFilter):
+        vLookupArray = stageFilter._vLookupArray
+        if vLookupArray is not None and vLookupArray.dtype == numpy.uint8:
+            return vLookupArray
+    return None
+
+
+def _composeLookupTables(tables):
+    """Return one table equivalent to applying the tables in order.
+
+    V tables have shape (256,) and apply to every channel, so a run of V
+    tables stays a V table that also works on gray frames. A run that
+    includes a BGR table of shape (256, 1, 3) becomes a BGR table.
+
+    """
+    if all(table.ndim == 1 for table in tables):
+        composed = tables[0]
+        for table in tables[1:]:
+            composed = table[composed]
+        return composed
+    channels = numpy.arange(3)
+    composed = numpy.broadcast_to(tables[0].reshape(256, -1), (256, 3))
+    for table in tables[1:]:
+        table = numpy.broadcast_to(table.reshape(256, -1), (256, 3))
+        composed = table[composed, channels]
+    return numpy.ascontiguousarray(composed, numpy.uint8).reshape(256, 1, 3)
@@ -0,0 +1,321 @@
+import collections
+import threading
+import time
+from buffer_pool import BufferPool
+from capture_manager import CaptureManager
+from capture_prefetcher import CapturePrefetcher
+from frame_stats import FrameStats
+from window_manager import WindowManager
+
+
+class FramePipeline(object):
+    """
+    Runs capture, processing and display/recording as three pipelined stages.
+
+    A capture thread grabs and retrieves frames, a process thread cuts out
+    the CaptureManager's region of interest and filters it in place, and the
+    calling thread draws and writes them through a CaptureManager (OpenCV
+    windows must be driven from the main thread). Every stage is timed in
+    the CaptureManager's stats, the threads' stages included.
+    Bounded queues sit between the stages, so at steady state a frame takes
+    as long as the slowest stage rather than the sum of all three. Each
+    stage is a single thread and the queues are FIFO, so frames stay in order.
+
+    The CaptureManager must not be prefetching or resampling; the pipeline
+    reads its capture directly.
+    """
+
+    STAGES = ("capture", "process", "output")
+
+    def __init__(
+        self,
+        captureManager: CaptureManager,
+        process=None,
+        queueSize: int = 2,
+    ):
+        """
+        :param process: a filter (with apply(src, dst)) or function
+            process(src, dst) applied in place to each frame, or None
+        :param queueSize: frames each queue holds before its producer waits
+        """
+        if captureManager.isPrefetching or captureManager.resampler is not None:
+            raise ValueError("the CaptureManager must not be prefetching or resampling")
+        self._captureManager: CaptureManager = captureManager
+        self._process = process
+        self._queueSize: int = queueSize
+
+        self._capturer: CapturePrefetcher = None
+        self._processor: _ProcessStage = None
+        self._isRunning: bool = False
+        self._startTime: float = None
+        self._stopTime: float = None
+        self._outputBusyTime: float = 0.0
+        self._outputStalls: int = 0
+        self._framesPresented: int = 0
+
+    # ==================================================================================================
+    # The FramePipeline class has the following properties:
+
+    @property
+    def isRunning(self) -> bool:
+        return self._isRunning
+
+    @property
+    def framesPresented(self) -> int:
+        return self._framesPresented
+
+    # ==================================================================================================
+    # The FramePipeline class has the following methods:
+
+    def start(self):
+        """
+        Start the capture and process threads.
+        """
+        if self.isRunning:
+            return
+        self._capturer = CapturePrefetcher(
+            self._captureManager.capture,
+            self._queueSize,
+            "block",
+            self._captureManager.channel,
+            self._captureManager.bufferPool,
+            self._captureManager.stats,
+        )
+        self._processor = _ProcessStage(
+            self._capturer,
+            self._captureManager.regionOf,
+            self._process,
+            self._queueSize,
+            self._captureManager.bufferPool,
+            self._captureManager.stats,
+        )
+        self._isRunning = True
+        self._startTime = time.perf_counter()
+        self._stopTime = None
+        self._capturer.start()
+        self._processor.start()
+
+    def stop(self):
+        """
+        Stop both threads and release every frame still in the queues.
+        """
+        if not self.isRunning:
+            return
+        # Stopping the capturer ends its queue, which ends the processor.
+        self._capturer.stop()
+        self._processor.stop()
+        self._isRunning = False
+        self._stopTime = time.perf_counter()
+
+    def presentNextFrame(self) -> bool:
+        """
+        Draw and write the next processed frame on the calling thread.
+
+        Return False once the capture is exhausted.
+        """
+        if self._processor.queuedFrames == 0:
+            self._outputStalls += 1
+        frame, timestamp, buffer = self._processor.get()
+        if frame is None:
+            return False
+        startTime = time.perf_counter()
+        self._captureManager.presentFrame(frame, timestamp, buffer)
+        self._outputBusyTime += time.perf_counter() - startTime
+        self._framesPresented += 1
+        return True
+
+    def run(self, windowManager: WindowManager = None):
+        """
+        Present frames until the capture ends or the window is destroyed
+        (e.g. by escape in its keypress callback), then stop the threads.
+        """
+        self.start()
+        try:
+            while windowManager is None or windowManager.isWindowCreated:
+                if not self.presentNextFrame():
+                    break
+                if windowManager is not None:
+                    windowManager.processEvents()
+        finally:
+            self.stop()
+
+    def occupancy(self) -> dict:
+        """
+        Return, per stage, the fraction of the elapsed time it was busy, the
+        times it waited for an input frame or for room in its output queue,
+        and the depth of its output queue.
+
+        The slowest stage has the highest busy fraction and limits throughput.
+        """
+        if self._startTime is None:
+            return {}
+        stopTime = self._stopTime or time.perf_counter()
+        elapsed = max(stopTime - self._startTime, 1e-9)
+        return {
+            "capture": {
+                "busy": self._capturer.busyTime / elapsed,
+                "inputWaits": 0,
+                "outputWaits": self._capturer.grabberStalls,
+                "queueDepth": self._capturer.queuedFrames,
+                "maxQueueDepth": self._capturer.maxQueuedFrames,
+            },
+            "process": {
+                "busy": self._processor.busyTime / elapsed,
+                "inputWaits": self._capturer.consumerStalls,
+                "outputWaits": self._processor.blockedPuts,
+                "queueDepth": self._processor.queuedFrames,
+                "maxQueueDepth": self._processor.maxQueuedFrames,
+            },
+            "output": {
+                "busy": self._outputBusyTime / elapsed,
+                "inputWaits": self._outputStalls,
+                "outputWaits": 0,
+                "queueDepth": 0,
+                "maxQueueDepth": 0,
+            },
+            "fps": self._framesPresented / elapsed,
+        }
+
+    def formatOccupancy(self) -> str:
+        """
+        Return a one-line summary of occupancy(), e.g. for logging.
+        """
+        occupancy = self.occupancy()
+        if not occupancy:
+            return "not started"
+        parts = [f"fps {occupancy['fps']:.1f}"]
+        for stage in self.STAGES:
+            summary = occupancy[stage]
+            parts.append(
+                f"{stage} {summary['busy'] * 100:.0f}% busy,"
+                f" waits {summary['inputWaits']} in/{summary['outputWaits']} out,"
+                f" queue {summary['maxQueueDepth']} max"
+            )
+        return " | ".join(parts)
+
+
+class _ProcessStage(threading.Thread):
+    """
+    The process thread of a FramePipeline: takes (frame, timestamp) pairs from
+    a source with get(), cuts out each frame's region, filters it in place and
+    queues it with the pooled buffer that holds it.
+    """
+
+    def __init__(
+        self,
+        source,
+        regionOf,
+        process,
+        queueSize: int,
+        bufferPool: BufferPool,
+        stats: FrameStats = None,  # records the "filter" stage
+    ):
+        super().__init__(daemon=True)
+        self._source = source
+        self._regionOf = regionOf
+        self._process = process.apply if hasattr(process, "apply") else process
+        self._queueSize: int = queueSize
+        self._bufferPool: BufferPool = bufferPool
+        self._stats: FrameStats = stats
+
+        self._queue: collections.deque = collections.deque()
+        self._condition = threading.Condition()
+        self._isStopping: bool = False
+        self._isExhausted: bool = False
+        self._error: BaseException = None  # raised by process, if it failed
+
+        self._busyTime: float = 0.0
+        self._blockedPuts: int = 0
+        self._maxQueuedFrames: int = 0
+
+    @property
+    def blockedPuts(self) -> int:
+        """Times a processed frame waited for room in the queue."""
+        return self._blockedPuts
+
+    @property
+    def busyTime(self) -> float:
+        """Seconds spent processing frames."""
+        return self._busyTime
+
+    @property
+    def queuedFrames(self) -> int:
+        return len(self._queue)
+
+    @property
+    def maxQueuedFrames(self) -> int:
+        return self._maxQueuedFrames
+
+    def run(self):
+        buffer = None  # the pooled buffer of the frame being processed
+        try:
+            while not self._isStopping:
+                frame, timestamp = self._source.get()
+                if frame is None:
+                    break
+                startTime = time.perf_counter()
+                buffer = frame
+                frame = self._regionOf(frame)
+                if frame is not buffer and frame.base is None:
+                    # The region was resized into a new buffer.
+                    self._bufferPool.release(buffer)
+                    buffer = frame
+                if self._process is not None:
+                    filterStartTime = time.perf_counter()
+                    self._process(frame, frame)
+                    if self._stats is not None:
+                        self._stats.addSample(
+                            "filter", time.perf_counter() - filterStartTime
+                        )
+                self._busyTime += time.perf_counter() - startTime
+
+                with self._condition:
+                    if len(self._queue) >= self._queueSize:
+                        self._blockedPuts += 1
+                    while len(self._queue) >= self._queueSize and not self._isStopping:
+                        self._condition.wait()
+                    if self._isStopping:
+                        self._bufferPool.release(buffer)
+                        break
+                    self._queue.append((frame, timestamp, buffer))
+                    buffer = None
+                    self._maxQueuedFrames = max(self._maxQueuedFrames, len(self._queue))
+                    self._condition.notify_all()
+        except BaseException as error:
+            # Re-raised by get(), so that a failure does not look like the
+            # end of the capture.
+            self._bufferPool.release(buffer)
+            self._error = error
+        finally:
+            with self._condition:
+                self._isExhausted = True
+                self._condition.notify_all()
+
+    def get(self) -> tuple:
+        """
+        Return the oldest processed frame, its timestamp and the pooled buffer
+        that holds it, waiting if necessary, or (None, None, None) once the
+        source is exhausted. Raise any error from processing a frame.
+        """
+        with self._condition:
+            while not self._queue and not self._isExhausted:
+                self._condition.wait()
+            if not self._queue:
+                if self._error is not None:
+                    raise self._error
+                return None, None, None
+            frame, timestamp, buffer = self._queue.popleft()
+            self._condition.notify_all()
+            return frame, timestamp, buffer
+
+    def stop(self):
+        """
+        Stop processing, release any queued frames and join the thread.
+        """
+        with self._condition:
+            self._isStopping = True
+            self._condition.notify_all()
+        if self.is_alive():
+            self.join()
+        while self._queue:
+            self._bufferPool.release(self._queue.popleft()[2])
@@ -0,0 +1,153 @@
+import bisect
+import collections
+import contextlib
+import threading
+import time
+
+
+class FrameStats(object):
+    """
+    Rolling-window FPS and per-stage timing histograms of a frame loop.
+
+    Times come from time.perf_counter(), a monotonic high-resolution clock.
+    Percentiles cover the last windowSize samples of each stage; histograms
+    count every sample since the last reset(). Stages may be timed from
+    several threads, e.g. those of a FramePipeline.
+    """
+
+    STAGES = (
+        "grab",
+        "retrieve",
+        "prefetchWait",  # the consumer's wait for a prefetched frame
+        "filter",
+        "show",
+        "imageWrite",
+        "videoWrite",
+    )
+    # Upper edges of the histogram buckets, in milliseconds.
+    BUCKET_EDGES_MS = (0.5, 1, 2, 4, 8, 16, 33, 66, 133, 266)
+
+    def __init__(self, windowSize: int = 60, logInterval: float = None):
+        """
+        :param windowSize: frames (and samples per stage) in the rolling window
+        :param logInterval: seconds between log lines, or None for no logging
+        """
+        self.logInterval: float = logInterval
+        self._windowSize: int = windowSize
+        self._lock = threading.RLock()
+        self.reset()
+
+    # ==================================================================================================
+    # The FrameStats class has the following properties:
+
+    @property
+    def fps(self) -> float:
+        """Frames per second over the rolling window, or None until 2 frames."""
+        if len(self._frameTimes) < 2:
+            return None
+        elapsed = self._frameTimes[-1] - self._frameTimes[0]
+        if elapsed <= 0.0:
+            return None
+        return (len(self._frameTimes) - 1) / elapsed
+
+    @property
+    def frameTime(self) -> float:
+        """Mean seconds per frame over the rolling window, or None."""
+        fps = self.fps
+        return None if fps is None else 1.0 / fps
+
+    # ==================================================================================================
+    # The FrameStats class has the following methods:
+
+    def reset(self):
+        with self._lock:
+            self._reset()
+
+    def _reset(self):
+        self._frameTimes: collections.deque = collections.deque(maxlen=self._windowSize)
+        self._samples: dict = {}
+        self._histograms: dict = {}
+        self._lastLogTime: float = None
+
+    def addFrame(self, timestamp: float = None):
+        """
+        Record that a frame finished at timestamp (default: now), and print a
+        log line if one is due.
+        """
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        with self._lock:
+            self._frameTimes.append(timestamp)
+
+            isLogDue = False
+            if self.logInterval is not None:
+                if self._lastLogTime is None:
+                    self._lastLogTime = timestamp
+                elif timestamp - self._lastLogTime >= self.logInterval:
+                    self._lastLogTime = timestamp
+                    isLogDue = True
+        if isLogDue:
+            print(self.formatLine())
+
+    def addSample(self, stage: str, seconds: float):
+        """
+        Record the duration of one run of a stage.
+        """
+        with self._lock:
+            if stage not in self._samples:
+                self._samples[stage] = collections.deque(maxlen=self._windowSize)
+                self._histograms[stage] = [0] * (len(self.BUCKET_EDGES_MS) + 1)
+            self._samples[stage].append(seconds)
+            self._histograms[stage][
+                bisect.bisect_left(self.BUCKET_EDGES_MS, seconds * 1000.0)
+            ] += 1
+
+    @contextlib.contextmanager
+    def stage(self, stage: str):
+        """
+        Time the body of a with statement as one run of a stage, e.g.
+
+            with captureManager.stats.stage("filter"):
+                filter.strokeEdges(frame, frame)
+        """
+        startTime = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.addSample(stage, time.perf_counter() - startTime)
+
+    def snapshot(self) -> dict:
+        """
+        Return the FPS and, per stage, the mean, median, 95th percentile and max
+        of the rolling window in seconds, plus the histogram counts.
+        """
+        stages = {}
+        with self._lock:
+            for stage in self._orderedStages():
+                samples = sorted(self._samples[stage])
+                stages[stage] = {
+                    "mean": sum(samples) / len(samples),
+                    "p50": samples[len(samples) // 2],
+                    "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+                    "max": samples[-1],
+                    "histogram": list(self._histograms[stage]),
+                }
+            fps = self.fps
+        return {"fps": fps, "stages": stages}
+
+    def formatLine(self) -> str:
+        """
+        Return a one-line summary: FPS and the mean/p95 of each stage in ms.
+        """
+        snapshot = self.snapshot()
+        fps = snapshot["fps"]
+        parts = ["fps " + ("n/a" if fps is None else f"{fps:.1f}")]
+        for stage, summary in snapshot["stages"].items():
+            parts.append(
+                f"{stage} {summary['mean'] * 1e3:.2f}/{summary['p95'] * 1e3:.2f} ms"
+            )
+        return " | ".join(parts)
+
+    def _orderedStages(self) -> list:
+        known = [stage for stage in self.STAGES if stage in self._samples]
+        return known + sorted(set(self._samples) - set(self.STAGES))
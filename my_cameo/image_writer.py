@@ -0,0 +1,112 @@
+import cv2
+import numpy
+import os
+import threading
+import concurrent.futures
+from buffer_pool import BufferPool
+
+
+class AsyncImageWriter(object):
+    """
+    Encode and save still images on a small thread pool.
+
+    The format follows the file extension (.png, .jpg/.jpeg or .webp). The
+    compression of each format is set by the public properties below.
+    """
+
+    def __init__(self, maxWorkers: int = 2, bufferPool: BufferPool = None):
+        # public properties
+        self.pngCompression: int = 3  # 0 (fastest) to 9 (smallest)
+        self.jpegQuality: int = 95  # 0 to 100
+        self.webpQuality: int = 95  # 1 to 100, above 100 is lossless
+
+        # private properties
+        self._maxWorkers: int = maxWorkers
+        self._bufferPool: BufferPool = bufferPool
+        self._executor: concurrent.futures.ThreadPoolExecutor = None
+        self._pending: set = set()
+        self._lock = threading.Lock()
+        self._imagesWritten: int = 0
+        self._failedWrites: int = 0
+
+    # ==================================================================================================
+    # The AsyncImageWriter class has the following properties:
+
+    @property
+    def pendingWrites(self) -> int:
+        return len(self._pending)
+
+    @property
+    def imagesWritten(self) -> int:
+        return self._imagesWritten
+
+    @property
+    def failedWrites(self) -> int:
+        return self._failedWrites
+
+    # ==================================================================================================
+    # The AsyncImageWriter class has the following methods:
+
+    def write(self, filename: str, frame: cv2.typing.MatLike):
+        """
+        Queue a frame to be saved. The writer encodes its own copy of the frame.
+        """
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                self._maxWorkers, thread_name_prefix="AsyncImageWriter"
+            )
+        params = self.encodeParams(filename)
+        if self._bufferPool is None:
+            frameCopy = frame.copy()
+        else:
+            frameCopy = self._bufferPool.acquire(frame.shape, frame.dtype)
+            numpy.copyto(frameCopy, frame)
+        with self._lock:
+            future = self._executor.submit(self._write, filename, frameCopy, params)
+            self._pending.add(future)
+        future.add_done_callback(lambda done: self._onDone(done, filename))
+
+    def encodeParams(self, filename: str) -> list:
+        """
+        Return the cv2.imwrite() parameters for the format of a filename.
+        """
+        extension = os.path.splitext(filename)[1].lower()
+        if extension == ".png":
+            return [cv2.IMWRITE_PNG_COMPRESSION, self.pngCompression]
+        if extension in (".jpg", ".jpeg"):
+            return [cv2.IMWRITE_JPEG_QUALITY, self.jpegQuality]
+        if extension == ".webp":
+            return [cv2.IMWRITE_WEBP_QUALITY, self.webpQuality]
+        return []
+
+    def flush(self):
+        """
+        Wait until every queued image has been written.
+        """
+        with self._lock:
+            pending = list(self._pending)
+        concurrent.futures.wait(pending)
+
+    def close(self):
+        """
+        Write every queued image and shut down the thread pool.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _write(self, filename: str, frame: cv2.typing.MatLike, params: list) -> bool:
+        try:
+            return cv2.imwrite(filename, frame, params)
+        finally:
+            if self._bufferPool is not None:
+                self._bufferPool.release(frame)
+
+    def _onDone(self, future: concurrent.futures.Future, filename: str):
+        with self._lock:
+            self._pending.discard(future)
+            if future.exception() is None and future.result():
+                self._imagesWritten += 1
+                return
+            self._failedWrites += 1
+        print(f"Error: Failed to write image {filename}.")
@@ -0,0 +1,313 @@
+import collections
+import threading
+import time
+import cv2
+import numpy
+from buffer_pool import BufferPool, sharedPool
+
+
+class MultiCaptureManager(object):
+    """
+    Captures synchronized frame sets from several cameras (or files) at once.
+
+    Each source has its own thread. On every tick, enterFrame() releases all
+    of them together: each grabs at once, so the grabs land as close in time
+    as the threads wake, and then retrieves its frame in parallel with the
+    others. Grabbing from one loop would be as tight, but a camera whose
+    grab() blocks would then hold back every camera after it.
+
+    A source that has not delivered its frame within timeout seconds, or is
+    still busy with an earlier tick, is missing from the frame set (its
+    frame is None) and never blocks the others. Its late frame is dropped.
+
+        manager = MultiCaptureManager([cv2.VideoCapture(i) for i in range(4)])
+        while ...:
+            manager.enterFrame()
+            for frame, timestamp in zip(manager.frames, manager.timestamps):
+                ...
+            manager.exitFrame()
+        print(manager.formatLine())
+        manager.release()
+    """
+
+    def __init__(
+        self,
+        captures: list,
+        timeout: float = 0.2,
+        channel: int = 0,
+        bufferPool: BufferPool = None,
+        windowSize: int = 60,
+    ):
+        """
+        :param captures: the cv2.VideoCapture of each source
+        :param timeout: seconds enterFrame() waits for the slowest source
+        :param windowSize: ticks in the rolling window of the skew statistics
+        """
+        self.timeout: float = timeout
+        self._bufferPool: BufferPool = sharedPool if bufferPool is None else bufferPool
+        self._condition = threading.Condition()
+        self._sources: list = [
+            _SourceThread(capture, channel, self._bufferPool, self._condition)
+            for capture in captures
+        ]
+        for source in self._sources:
+            source.start()
+
+        self._tick: int = 0
+        self._enteredFrame: bool = False
+        self._frames: list = [None] * len(self._sources)
+        self._timestamps: list = [None] * len(self._sources)
+
+        # statistics
+        self._startTime: float = None
+        self._framesDelivered: list = [0] * len(self._sources)
+        self._missedTicks: list = [0] * len(self._sources)
+        self._skews: collections.deque = collections.deque(maxlen=windowSize)
+
+    # ==================================================================================================
+    # The MultiCaptureManager class has the following properties:
+
+    @property
+    def numSources(self) -> int:
+        return len(self._sources)
+
+    @property
+    def frames(self) -> list:
+        """
+        The current frame of each source, or None where a source missed the
+        tick. The frames are valid until exitFrame().
+        """
+        return self._frames
+
+    @property
+    def timestamps(self) -> list:
+        """
+        When each current frame was grabbed, in time.perf_counter() seconds,
+        or None where a source missed the tick.
+        """
+        return self._timestamps
+
+    @property
+    def hasFrames(self) -> bool:
+        """Whether any source delivered a frame on the current tick."""
+        return any(frame is not None for frame in self._frames)
+
+    @property
+    def skew(self) -> float:
+        """
+        Seconds between the first and last grab of the current frame set, or
+        None with fewer than two frames.
+        """
+        return _skewOf(self._timestamps)
+
+    @property
+    def ticks(self) -> int:
+        return self._tick
+
+    # ==================================================================================================
+    # The MultiCaptureManager class has the following methods:
+
+    def enterFrame(self):
+        """
+        Grab and retrieve a frame set from all sources, waiting at most
+        timeout seconds for the slowest of them.
+        """
+        assert not self._enteredFrame, (
+            "previous enterFrame() had no matching exitFrame()"
+        )
+        if self._startTime is None:
+            self._startTime = time.perf_counter()
+        self._tick += 1
+
+        with self._condition:
+            waiting = []
+            for index, source in enumerate(self._sources):
+                # Drop a frame that arrived after its tick had timed out.
+                self._bufferPool.release(source.takeResult()[0])
+                if source.isBusy:
+                    self._missedTicks[index] += 1
+                else:
+                    source.requestTick(self._tick)
+                    waiting.append(source)
+            self._condition.notify_all()
+
+            deadline = time.perf_counter() + self.timeout
+            while any(source.resultTick != self._tick for source in waiting):
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0.0:
+                    break
+                self._condition.wait(remaining)
+
+            for index, source in enumerate(self._sources):
+                frame, timestamp = None, None
+                if source in waiting and source.resultTick == self._tick:
+                    frame, timestamp = source.takeResult()
+                elif source in waiting:
+                    self._missedTicks[index] += 1
+                self._frames[index] = frame
+                self._timestamps[index] = timestamp
+                if frame is not None:
+                    self._framesDelivered[index] += 1
+
+        skew = self.skew
+        if skew is not None:
+            self._skews.append(skew)
+        self._enteredFrame = True
+
+    def exitFrame(self):
+        """
+        Release the current frame set.
+        """
+        for index, frame in enumerate(self._frames):
+            self._bufferPool.release(frame)
+            self._frames[index] = None
+            self._timestamps[index] = None
+        self._enteredFrame = False
+
+    def release(self):
+        """
+        Stop the source threads and release any frames they still hold. The
+        captures themselves are left open.
+        """
+        if self._enteredFrame:
+            self.exitFrame()
+        for source in self._sources:
+            source.stop()
+        for source in self._sources:
+            # A source stuck in grab() is a daemon thread and is left behind.
+            source.join(self.timeout)
+            self._bufferPool.release(source.takeResult()[0])
+
+    def snapshot(self) -> dict:
+        """
+        Return the ticks and frame sets per second, the frames per second of
+        each source and of all sources together, the frames each source
+        missed, and the mean and max grab skew of the rolling window in
+        seconds.
+        """
+        if self._startTime is None:
+            return {}
+        elapsed = max(time.perf_counter() - self._startTime, 1e-9)
+        return {
+            "ticks": self._tick,
+            "tickRate": self._tick / elapsed,
+            "fps": sum(self._framesDelivered) / elapsed,
+            "sourceFps": [count / elapsed for count in self._framesDelivered],
+            "missedTicks": list(self._missedTicks),
+            "meanSkew": sum(self._skews) / len(self._skews) if self._skews else None,
+            "maxSkew": max(self._skews) if self._skews else None,
+        }
+
+    def formatLine(self) -> str:
+        """
+        Return a one-line summary of snapshot(), e.g. for logging.
+        """
+        snapshot = self.snapshot()
+        if not snapshot:
+            return "not started"
+        parts = [
+            f"{snapshot['tickRate']:.1f} sets/s, {snapshot['fps']:.1f} fps in total"
+        ]
+        for index, fps in enumerate(snapshot["sourceFps"]):
+            parts.append(
+                f"source {index} {fps:.1f} fps, {snapshot['missedTicks'][index]} missed"
+            )
+        if snapshot["maxSkew"] is not None:
+            parts.append(
+                f"skew {snapshot['meanSkew'] * 1e3:.2f}/{snapshot['maxSkew'] * 1e3:.2f} ms"
+            )
+        return " | ".join(parts)
+
+
+class _SourceThread(threading.Thread):
+    """
+    The thread of one MultiCaptureManager source: on each requested tick it
+    grabs and retrieves a frame into a pooled buffer and posts the result.
+    """
+
+    def __init__(
+        self,
+        capture: cv2.VideoCapture,
+        channel: int,
+        bufferPool: BufferPool,
+        condition: threading.Condition,
+    ):
+        super().__init__(daemon=True)
+        self._capture: cv2.VideoCapture = capture
+        self._channel: int = channel
+        self._bufferPool: BufferPool = bufferPool
+        self._frameShape: tuple = None
+
+        # Shared with the MultiCaptureManager, which holds it to call the
+        # methods below.
+        self._condition = condition
+        self._requestedTick: int = 0
+        self._resultTick: int = 0
+        self._result: tuple = None  # (frame, timestamp)
+        self._isStopping: bool = False
+
+    @property
+    def isBusy(self) -> bool:
+        """Whether an earlier tick is still being grabbed or retrieved."""
+        return self._requestedTick != self._resultTick
+
+    @property
+    def resultTick(self) -> int:
+        return self._resultTick
+
+    def requestTick(self, tick: int):
+        self._requestedTick = tick
+
+    def takeResult(self) -> tuple:
+        """
+        Return the posted (frame, timestamp), or (None, None), and forget it.
+        The frame of the last tick is posted once resultTick reaches it.
+        """
+        result = self._result
+        self._result = None
+        return (None, None) if result is None else result
+
+    def stop(self):
+        with self._condition:
+            self._isStopping = True
+            self._condition.notify_all()
+
+    def run(self):
+        while True:
+            with self._condition:
+                while self._requestedTick == self._resultTick and not self._isStopping:
+                    self._condition.wait()
+                if self._isStopping:
+                    return
+                tick = self._requestedTick
+
+            frame, timestamp = None, None
+            if self._capture.grab():
+                timestamp = time.perf_counter()
+                frame = self._retrieve()
+
+            with self._condition:
+                if self._result is not None:
+                    # Never taken: its tick timed out.
+                    self._bufferPool.release(self._result[0])
+                self._result = (frame, None if frame is None else timestamp)
+                self._resultTick = tick
+                self._condition.notify_all()
+
+    def _retrieve(self) -> numpy.ndarray:
+        buffer = None
+        if self._frameShape is not None:
+            buffer = self._bufferPool.acquire(self._frameShape)
+        _, frame = self._capture.retrieve(buffer, self._channel)
+        if frame is not None and frame is not buffer:
+            self._bufferPool.release(buffer)
+            self._bufferPool.register(frame)
+            self._frameShape = frame.shape
+        return frame
+
+
+def _skewOf(timestamps: list) -> float:
+    timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+    if len(timestamps) < 2:
+        return None
+    return max(timestamps) - min(timestamps)
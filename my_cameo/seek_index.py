@@ -0,0 +1,97 @@
+import cv2
+import bisect
+import json
+import os
+
+
+class SeekIndex(object):
+    """
+    The keyframe positions of a video file, cached in a sidecar file.
+
+    The index is built by scanning the file's packets without decoding them,
+    and is rebuilt whenever the file's modification time or size changes.
+    """
+
+    SIDECAR_SUFFIX = ".seekindex.json"
+    VERSION = 1
+
+    def __init__(self, videoPath: str, keyframes: list, frameCount: int):
+        self.videoPath: str = videoPath
+        self.keyframes: list = sorted(keyframes) or [0]
+        self.frameCount: int = frameCount
+
+    # ==================================================================================================
+    # The SeekIndex class has the following methods:
+
+    @classmethod
+    def load(cls, videoPath: str) -> "SeekIndex":
+        """
+        Return the index of a video file, from its sidecar file if that is still
+        valid, otherwise by scanning the video and saving a new sidecar file.
+        """
+        sidecarPath = videoPath + cls.SIDECAR_SUFFIX
+        try:
+            with open(sidecarPath, encoding="utf-8") as sidecarFile:
+                data = json.load(sidecarFile)
+            if data.get("version") == cls.VERSION and data.get(
+                "fileStamp"
+            ) == cls._fileStamp(videoPath):
+                return cls(videoPath, data["keyframes"], data["frameCount"])
+        except (OSError, ValueError, KeyError):
+            pass
+
+        index = cls.build(videoPath)
+        index.save()
+        return index
+
+    @classmethod
+    def build(cls, videoPath: str) -> "SeekIndex":
+        """
+        Scan a video file for its keyframes.
+
+        If the backend cannot report keyframes, only frame 0 is recorded, so
+        seeks decode forward from the start: slow but exact.
+        """
+        capture = cv2.VideoCapture(videoPath)
+        if not capture.isOpened():
+            raise IOError(f"cannot open video {videoPath}")
+
+        # In raw mode, grab() reads packets without decoding them.
+        isRaw = capture.set(cv2.CAP_PROP_FORMAT, -1)
+        keyframes = []
+        frameCount = 0
+        while capture.grab():
+            if isRaw and capture.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME) > 0:
+                keyframes.append(frameCount)
+            frameCount += 1
+        capture.release()
+        return cls(videoPath, keyframes, frameCount)
+
+    def save(self):
+        """
+        Write the index to its sidecar file, if the directory is writable.
+        """
+        data = {
+            "version": self.VERSION,
+            "fileStamp": self._fileStamp(self.videoPath),
+            "frameCount": self.frameCount,
+            "keyframes": self.keyframes,
+        }
+        try:
+            with open(
+                self.videoPath + self.SIDECAR_SUFFIX, "w", encoding="utf-8"
+            ) as sidecarFile:
+                json.dump(data, sidecarFile)
+        except OSError as error:
+            print(f"Warning: Cannot save the seek index of {self.videoPath}: {error}")
+
+    def keyframeBefore(self, frame: int) -> int:
+        """
+        Return the last keyframe at or before a frame.
+        """
+        return self.keyframes[max(0, bisect.bisect_right(self.keyframes, frame) - 1)]
+
+    @staticmethod
+    def _fileStamp(videoPath: str) -> list:
+        status = os.stat(videoPath)
+        return [status.st_mtime_ns, status.st_size]
@@ -0,0 +1,124 @@
+import concurrent.futures
+import os
+import numpy
+from buffer_pool import BufferPool, sharedPool
+
+
+class TileExecutor(object):
+    """
+    Runs filters over horizontal bands of a frame on a persistent thread pool.
+
+    NumPy and OpenCV release the GIL inside their loops, so the bands really
+    run in parallel. Per-pixel filters write straight into their band of dst.
+    Neighbourhood filters (convolutions, median blurs, ...) read halo rows
+    above and below their band and write through a pooled band buffer.
+
+    OpenCV also parallelises some functions internally; cv2.setNumThreads(1)
+    leaves all of the parallelism to the bands.
+    """
+
+    def __init__(
+        self,
+        numThreads: int = None,
+        numTiles: int = None,
+        bufferPool: BufferPool = None,
+    ):
+        """
+        :param numThreads: threads in the pool (default: the number of CPUs)
+        :param numTiles: bands per frame (default: numThreads)
+        """
+        self._numThreads: int = numThreads or os.cpu_count() or 1
+        self.numTiles: int = numTiles or self._numThreads
+        self._bufferPool: BufferPool = sharedPool if bufferPool is None else bufferPool
+        # ThreadPoolExecutor starts its threads on first use and keeps them.
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            self._numThreads, thread_name_prefix="tile"
+        )
+
+    # ==================================================================================================
+    # The TileExecutor class has the following properties:
+
+    @property
+    def numThreads(self) -> int:
+        return self._numThreads
+
+    # ==================================================================================================
+    # The TileExecutor class has the following methods:
+
+    def bands(self, height: int, numTiles: int = None) -> list:
+        """
+        Return the row slices of up to numTiles (default: self.numTiles)
+        bands of roughly equal height.
+        """
+        numTiles = max(1, min(numTiles or self.numTiles, height))
+        bounds = numpy.linspace(0, height, numTiles + 1).astype(int)
+        return [slice(bounds[i], bounds[i + 1]) for i in range(numTiles)]
+
+    def forEachBand(self, func, height: int, numTiles: int = None):
+        """
+        Call func(rows) for each band of rows, a slice, in parallel, and return
+        once every band is done. Exceptions are re-raised in the caller.
+        """
+        bands = self.bands(height, numTiles)
+        if len(bands) == 1:
+            func(bands[0])
+            return
+        futures = [self._executor.submit(func, rows) for rows in bands]
+        for future in futures:
+            future.result()
+
+    def apply(self, filterFunc, src, dst, halo: int = 0, numTiles: int = None):
+        """
+        Apply filterFunc(src, dst) band by band.
+
+        :param halo: rows of context the filter needs on each side of a band,
+            e.g. kernelHeight // 2 for a convolution; 0 for per-pixel filters
+        """
+        height = src.shape[0]
+        if halo <= 0:
+            self.forEachBand(
+                lambda rows: filterFunc(src[rows], dst[rows]), height, numTiles
+            )
+            return
+
+        # With src as dst, a band written early would corrupt the halo rows
+        # read by its neighbours, so every band is filtered before any is stored.
+        isInPlace = numpy.shares_memory(src, dst)
+        bandBuffers = {}
+
+        def filterBand(rows):
+            start = max(0, rows.start - halo)
+            stop = min(height, rows.stop + halo)
+            bandBuffer = self._bufferPool.acquire(
+                (stop - start,) + dst.shape[1:], dst.dtype
+            )
+            filterFunc(src[start:stop], bandBuffer)
+            interior = bandBuffer[rows.start - start : rows.stop - start]
+            if isInPlace:
+                bandBuffers[rows.start] = (bandBuffer, interior)
+            else:
+                numpy.copyto(dst[rows], interior)
+                self._bufferPool.release(bandBuffer)
+
+        def storeBand(rows):
+            bandBuffer, interior = bandBuffers.pop(rows.start)
+            numpy.copyto(dst[rows], interior)
+            self._bufferPool.release(bandBuffer)
+
+        try:
+            self.forEachBand(filterBand, height, numTiles)
+            if isInPlace:
+                self.forEachBand(storeBand, height, numTiles)
+        finally:
+            for bandBuffer, _ in bandBuffers.values():
+                self._bufferPool.release(bandBuffer)
+
+    def shutdown(self):
+        """
+        Stop the pool's threads once any running bands are done.
+        """
+        self._executor.shutdown(wait=True)
+
+
+# The executor used by filters unless they are given their own.
+sharedExecutor = TileExecutor()
@@ -0,0 +1,179 @@
+import math
+import time
+import cv2
+import numpy
+from buffer_pool import BufferPool, sharedPool
+
+
+class TimelineResampler(object):
+    """
+    Resamples a stream of frames to another frame rate along its timeline.
+
+    Output frame k shows the input at position k * step, counted in input
+    frames. A step above 1 fast-forwards by dropping frames, a step below 1
+    slows down by repeating them, and any ratio in between works. With blend,
+    a position between two input frames is a linear blend of the two;
+    otherwise it shows the earlier one.
+
+    Input frames that no output frame shows are skipped with skipFrames(), e.g.
+    by VideoCapture.grab() without retrieve() or by a seek, so they are never
+    converted to BGR.
+    """
+
+    # Positions closer than this to an input frame show that frame unblended.
+    EPSILON = 1e-3
+
+    def __init__(
+        self, step: float = 1.0, blend: bool = False, bufferPool: BufferPool = None
+    ):
+        """
+        :param step: input frames per output frame, e.g. 2.0 for double speed
+            or 0.5 for half speed
+        :param blend: blend the two input frames around each output position
+        """
+        self.step = step
+        self.blend: bool = blend
+        self._bufferPool: BufferPool = sharedPool if bufferPool is None else bufferPool
+
+        self._position: float = 0.0  # of the next output frame, in input frames
+        self._inputIndex: int = -1  # of the last input frame taken from the source
+        self._lastShownIndex: int = None
+        self._heldFrames: dict = {}  # input index -> (pooled frame, timestamp)
+        self._isExhausted: bool = False
+
+        # statistics
+        self._skippedFrames: int = 0
+        self._repeatedFrames: int = 0
+        self._blendedFrames: int = 0
+
+    @classmethod
+    def fromFps(
+        cls,
+        inputFps: float,
+        outputFps: float,
+        speed: float = 1.0,
+        blend: bool = False,
+        bufferPool: BufferPool = None,
+    ) -> "TimelineResampler":
+        """
+        Return a resampler that plays an inputFps stream at outputFps, speed
+        times faster than real time.
+        """
+        if inputFps <= 0.0 or outputFps <= 0.0:
+            raise ValueError(
+                f"frame rates must be positive, got {inputFps} and {outputFps}"
+            )
+        return cls(speed * inputFps / outputFps, blend, bufferPool)
+
+    # ==================================================================================================
+    # The TimelineResampler class has the following properties:
+
+    @property
+    def step(self) -> float:
+        """
+        Input frames per output frame. Changing it takes effect from the next
+        output frame.
+        """
+        return self._step
+
+    @step.setter
+    def step(self, value: float):
+        if value <= 0.0:
+            raise ValueError(f"step must be positive, got {value}")
+        self._step = float(value)
+
+    @property
+    def skippedFrames(self) -> int:
+        """Input frames skipped without being retrieved."""
+        return self._skippedFrames
+
+    @property
+    def repeatedFrames(self) -> int:
+        """Output frames that repeated the previous input frame."""
+        return self._repeatedFrames
+
+    @property
+    def blendedFrames(self) -> int:
+        return self._blendedFrames
+
+    @property
+    def inputIndex(self) -> int:
+        """
+        The input frame, counted from the start or the last reset(), that
+        the last output frame showed, or None.
+        """
+        return self._lastShownIndex
+
+    # ==================================================================================================
+    # The TimelineResampler class has the following methods:
+
+    def next(self, skipFrames, readFrame) -> tuple:
+        """
+        Return the next output frame and its timestamp, or (None, None) once
+        the source is exhausted.
+
+        :param skipFrames: skipFrames(count) advances the source by count frames
+            without retrieving them, and returns how many it skipped, fewer
+            at the end of the source
+        :param readFrame: readFrame() returns the source's next frame, in a
+            buffer from the pool, and its timestamp, or (None, None)
+
+        The frame is a pooled buffer that the caller owns and must release.
+        Repeated and blended frames are stamped when they are returned.
+        """
+        index = math.floor(self._position + self.EPSILON)
+        weight = self._position - index if self.blend else 0.0
+        lastIndex = index + 1 if weight > self.EPSILON else index
+
+        for heldIndex in [i for i in self._heldFrames if i < index]:
+            self._bufferPool.release(self._heldFrames.pop(heldIndex)[0])
+        skipCount = index - self._inputIndex - 1
+        if skipCount > 0 and not self._isExhausted:
+            skipped = skipFrames(skipCount)
+            self._skippedFrames += skipped
+            self._inputIndex += skipped
+            self._isExhausted = skipped < skipCount
+        while self._inputIndex < lastIndex and not self._isExhausted:
+            frame, timestamp = readFrame()
+            if frame is None:
+                self._isExhausted = True
+                break
+            self._inputIndex += 1
+            self._heldFrames[self._inputIndex] = (frame, timestamp)
+
+        if index not in self._heldFrames:
+            return None, None
+        self._position += self._step
+        frame, timestamp = self._heldFrames[index]
+        isRepeated = index == self._lastShownIndex
+        self._lastShownIndex = index
+
+        if lastIndex in self._heldFrames and lastIndex != index:
+            nextFrame, _ = self._heldFrames[lastIndex]
+            output = self._bufferPool.acquire(frame.shape, frame.dtype)
+            cv2.addWeighted(frame, 1.0 - weight, nextFrame, weight, 0.0, output)
+            self._blendedFrames += 1
+            return output, time.perf_counter()
+
+        if isRepeated:
+            self._repeatedFrames += 1
+            timestamp = time.perf_counter()
+        if math.floor(self._position + self.EPSILON) > index:
+            # No later output frame shows this one, so hand it over.
+            del self._heldFrames[index]
+            return frame, timestamp
+        output = self._bufferPool.acquire(frame.shape, frame.dtype)
+        numpy.copyto(output, frame)
+        return output, timestamp
+
+    def reset(self):
+        """
+        Start again from the source's current frame, e.g. after a seek.
+        """
+        for frame, _ in self._heldFrames.values():
+            self._bufferPool.release(frame)
+        self._heldFrames.clear()
+        self._position = 0.0
+        self._inputIndex = -1
+        self._lastShownIndex = None
+        self._isExhausted = False
@@ -30,6 +30,8 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
+import functools
+
 import numpy
 import scipy.interpolate
 
@@ -44,20 +46,75 @@ def createFlatView(array):
 def createLookupArray(func, length=256):
     """Return a lookup for whole-number inputs to a function.
 
-    The lookup values are clamped to [0, length - 1].
+    The lookup values are clamped to [0, length - 1] and truncated to the
+    smallest unsigned integer type that holds them (uint8 for 256 entries).
+    The function is evaluated once over all inputs if it accepts arrays.
 
     """
     if func is None:
         return None
-    lookupArray = numpy.empty(length)
-    i = 0
-    while i < length:
-        func_i = func(i)
-        lookupArray[i] = min(max(0, func_i), length - 1)
-        i += 1
+    inputs = numpy.arange(length)
+    try:
+        values = numpy.asarray(func(inputs), numpy.float64)
+    except (TypeError, ValueError):
+        values = None
+    if values is None or values.shape != inputs.shape:
+        # The function only accepts scalars.
+        values = numpy.array([func(i) for i in inputs], numpy.float64)
+    # Out-of-bounds interpolation yields NaN, which clamps to 0.
+    numpy.nan_to_num(values, copy=False, nan=0.0)
+    numpy.clip(values, 0, length - 1, out=values)
+    return values.astype(numpy.min_scalar_type(length - 1))
+
+
+def createCurveLookupArray(points, vPoints=None, length=256):
+    """Return a cached lookup for a curve, optionally composed with a V curve.
+
+    Identical control points share one read-only lookup array per process.
+
+    """
+    return _createCurveLookupArray(_pointsKey(points), _pointsKey(vPoints), length)
+
+
+@functools.lru_cache(maxsize=None)
+def _createCurveLookupArray(pointsKey, vPointsKey, length):
+    func = createCompositeFunc(createCurveFunc(pointsKey), createCurveFunc(vPointsKey))
+    lookupArray = createLookupArray(func, length)
+    if lookupArray is not None:
+        lookupArray.flags.writeable = False
     return lookupArray
 
 
+def _pointsKey(points):
+    if points is None:
+        return None
+    return tuple((float(x), float(y)) for x, y in points)
+
+
+def createBGRLookupTable(bLookupArray, gLookupArray, rLookupArray):
+    """Return a 256x1x3 uint8 table for cv2.LUT from per-channel lookups.
+
+    Channels without a lookup map to themselves. Return None if no channel
+    has a lookup or if the lookups are not 8-bit.
+
+    """
+    lookupArrays = (bLookupArray, gLookupArray, rLookupArray)
+    if all(lookupArray is None for lookupArray in lookupArrays):
+        return None
+    identity = numpy.arange(256, dtype=numpy.uint8)
+    channels = []
+    for lookupArray in lookupArrays:
+        if lookupArray is None:
+            channels.append(identity)
+        elif lookupArray.size != 256:
+            return None
+        else:
+            channels.append(lookupArray.astype(numpy.uint8))
+    table = numpy.dstack(channels).reshape(256, 1, 3)
+    table.flags.writeable = False
+    return table
+
+
 def applyLookupArray(lookupArray, src, dst):
     """Map a source to a destination using a lookup."""
     if lookupArray is None:
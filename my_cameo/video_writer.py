@@ -0,0 +1,353 @@
+import cv2
+import numpy
+import os
+import tempfile
+import threading
+import collections
+import time
+from buffer_pool import BufferPool
+
+
+class AsyncVideoWriter(threading.Thread):
+    """
+    A worker thread that owns a cv2.VideoWriter and encodes frames off the main loop.
+
+    Frames wait in a bounded queue. When the queue is full, the backpressure policy
+    decides what happens to the next frame:\n
+        "drop"  -> discard the frame.\n
+        "block" -> wait until the worker frees a slot.\n
+        "spill" -> save the frame to a temporary file; it is encoded in order later.
+
+    When lockToTimeline is True, each frame is placed by its capture timestamp:
+    frames are duplicated to fill gaps and dropped when they arrive too early,
+    so that the output plays back in real time. When fps is None, the first
+    warmupFrames frames are held back to estimate the FPS from their timestamps
+    and are then written like any other frame.
+    """
+
+    POLICIES = ("drop", "block", "spill")
+    FALLBACK_FPS = 30.0  # used if closed before the FPS could be estimated
+
+    def __init__(
+        self,
+        filename: str,
+        encoding: int,
+        fps: float,
+        size: tuple,
+        queueSize: int = 8,
+        backpressure: str = "block",
+        bufferPool: BufferPool = None,
+        lockToTimeline: bool = False,
+        warmupFrames: int = 20,
+    ):
+        super().__init__(daemon=True)
+        if queueSize < 1:
+            raise ValueError(f"queue size must be at least 1, got {queueSize}")
+        if backpressure not in self.POLICIES:
+            raise ValueError(
+                f"backpressure must be one of {self.POLICIES}, got {backpressure!r}"
+            )
+
+        self._filename: str = filename
+        self._encoding: int = encoding
+        self._fps: float = fps
+        self._size: tuple = size
+        self._writer: cv2.VideoWriter = None
+        if fps is not None:
+            self._writer = cv2.VideoWriter(filename, encoding, fps, size)
+        self._queueSize: int = queueSize
+        self._backpressure: str = backpressure
+        self._bufferPool: BufferPool = bufferPool
+
+        # Items are either frames held in memory or paths of spilled frames,
+        # kept in one deque so that the encoding order is the submission order.
+        self._items: collections.deque = collections.deque()
+        self._framesInMemory: int = 0
+        self._condition = threading.Condition()
+        self._isClosing: bool = False
+        self._error: BaseException = None  # raised by the worker, if it failed
+        self._spillDir: tempfile.TemporaryDirectory = None
+        # Spilled paths whose frames are still being saved by write().
+        self._pendingSpills: set = set()
+
+        # private properties for the timeline
+        # _warmupItems holds (frame, timestamp, isPooled) until the FPS is known.
+        self._lockToTimeline: bool = lockToTimeline
+        self._warmupFrames: int = warmupFrames
+        self._warmupItems: list = []
+        self._timelineStart: float = None
+
+        # statistics
+        self._framesWritten: int = 0
+        self._droppedFrames: int = 0
+        self._spilledFrames: int = 0
+        self._blockedWrites: int = 0
+        self._lastEncodeLatency: float = 0.0
+        self._totalEncodeTime: float = 0.0
+        self._maxQueueDepth: int = 0
+        self._duplicatedFrames: int = 0
+        self._lateFrames: int = 0
+
+    # ==================================================================================================
+    # The AsyncVideoWriter class has the following properties:
+
+    @property
+    def queueDepth(self) -> int:
+        """Frames waiting to be encoded, including spilled ones."""
+        return len(self._items)
+
+    @property
+    def maxQueueDepth(self) -> int:
+        return self._maxQueueDepth
+
+    @property
+    def framesWritten(self) -> int:
+        return self._framesWritten
+
+    @property
+    def droppedFrames(self) -> int:
+        return self._droppedFrames
+
+    @property
+    def spilledFrames(self) -> int:
+        return self._spilledFrames
+
+    @property
+    def blockedWrites(self) -> int:
+        return self._blockedWrites
+
+    @property
+    def lastEncodeLatency(self) -> float:
+        """Seconds spent in the most recent cv2.VideoWriter.write() call."""
+        return self._lastEncodeLatency
+
+    @property
+    def averageEncodeLatency(self) -> float:
+        if self._framesWritten == 0:
+            return 0.0
+        return self._totalEncodeTime / self._framesWritten
+
+    @property
+    def duplicatedFrames(self) -> int:
+        """Extra copies written to fill gaps in the timeline."""
+        return self._duplicatedFrames
+
+    @property
+    def lateFrames(self) -> int:
+        """Frames dropped because the timeline had already passed their slot."""
+        return self._lateFrames
+
+    @property
+    def fps(self) -> float:
+        """The output FPS, or None while it is being estimated."""
+        return self._fps
+
+    @property
+    def isOpened(self) -> bool:
+        return self._writer is not None and self._writer.isOpened()
+
+    # ==================================================================================================
+    # The AsyncVideoWriter class has the following methods:
+
+    def write(self, frame: cv2.typing.MatLike, timestamp: float = None):
+        """
+        Queue a frame for encoding. The writer takes ownership of the frame and,
+        if it has a buffer pool, releases the frame to the pool when done.
+
+        :param timestamp: capture time in seconds (time.perf_counter()), needed
+            for lockToTimeline and for estimating an unknown FPS
+        """
+        if tuple(frame.shape[1::-1]) != tuple(self._size):
+            # cv2.VideoWriter would silently skip the frame.
+            self._release(frame)
+            raise ValueError(
+                f"frame size {frame.shape[1::-1]} does not match the video size "
+                f"{tuple(self._size)}"
+            )
+        with self._condition:
+            if self._isClosing:
+                self._release(frame)
+                raise RuntimeError("write() called on a closed AsyncVideoWriter")
+            if self._error is not None:
+                self._release(frame)
+                raise self._error
+
+            path = None  # of the frame's spill file, if it is spilled
+            if self._framesInMemory >= self._queueSize:
+                if self._backpressure == "drop":
+                    self._droppedFrames += 1
+                    self._release(frame)
+                    return
+                if self._backpressure == "spill":
+                    # Reserve the frame's place in the queue, then save it
+                    # without the lock so that the worker keeps encoding.
+                    path = self._spillPath()
+                    self._items.append((path, timestamp))
+                    self._pendingSpills.add(path)
+                    self._spilledFrames += 1
+                    self._updateQueueDepth()
+                else:
+                    self._blockedWrites += 1
+                    while (
+                        self._framesInMemory >= self._queueSize and self._error is None
+                    ):
+                        self._condition.wait()
+                    if self._error is not None:
+                        # The worker died and will never free a slot.
+                        self._release(frame)
+                        raise self._error
+
+            if path is None:
+                self._items.append((frame, timestamp))
+                self._framesInMemory += 1
+                self._updateQueueDepth()
+                self._condition.notify_all()
+                return
+
+        isSaved = False
+        try:
+            numpy.save(path, frame)
+            isSaved = True
+        finally:
+            self._release(frame)
+            with self._condition:
+                self._pendingSpills.discard(path)
+                if not isSaved:
+                    # The worker waits for a pending head, so it is still queued.
+                    self._items = collections.deque(
+                        item for item in self._items if item[0] is not path
+                    )
+                    self._spilledFrames -= 1
+                self._condition.notify_all()
+
+    def close(self):
+        """
+        Encode every queued frame, then join the worker and release the file.
+        """
+        with self._condition:
+            self._isClosing = True
+            self._condition.notify_all()
+        if self.is_alive():
+            self.join()
+        if self._writer is not None:
+            self._writer.release()
+        if self._spillDir is not None:
+            self._spillDir.cleanup()
+            self._spillDir = None
+        if self._error is not None:
+            raise self._error
+
+    def run(self):
+        try:
+            self._encodeItems()
+        except BaseException as error:
+            # Hand the error to write() and close() on the caller's thread, and
+            # wake a write() that waits for a slot the worker will never free.
+            with self._condition:
+                self._error = error
+                for item, _ in self._items:
+                    if not isinstance(item, str):
+                        self._release(item)
+                self._items.clear()
+                self._framesInMemory = 0
+                self._condition.notify_all()
+            for frame, _, isPooled in self._warmupItems:
+                if isPooled:
+                    self._release(frame)
+            self._warmupItems.clear()
+
+    def _encodeItems(self):
+        while True:
+            with self._condition:
+                # Wait for a frame, and for a spilled one to be saved.
+                while (
+                    not self._items and not self._isClosing
+                ) or self._isHeadPending():
+                    self._condition.wait()
+                if not self._items:
+                    break
+                item, timestamp = self._items.popleft()
+                isPooled = not isinstance(item, str)
+                if isPooled:
+                    self._framesInMemory -= 1
+                self._condition.notify_all()
+
+            if isPooled:
+                frame = item
+            else:
+                frame = numpy.load(item)
+                os.remove(item)
+
+            if self._writer is None:
+                self._warmupItems.append((frame, timestamp, isPooled))
+                if len(self._warmupItems) >= self._warmupFrames:
+                    self._finishWarmup()
+                continue
+            self._writeOnTimeline(frame, timestamp)
+            if isPooled:
+                self._release(frame)
+
+        if self._writer is None:
+            self._finishWarmup()
+
+    def _finishWarmup(self):
+        """
+        Estimate the FPS from the held-back frames, open the file and write them.
+        """
+        timestamps = [
+            timestamp for _, timestamp, _ in self._warmupItems if timestamp is not None
+        ]
+        self._fps = self.FALLBACK_FPS
+        if len(timestamps) >= 2 and timestamps[-1] > timestamps[0]:
+            self._fps = (len(timestamps) - 1) / (timestamps[-1] - timestamps[0])
+            # Containers store the FPS with limited precision (AVI in 1/100ths),
+            # so place frames with the rate the file will actually play at.
+            self._fps = round(self._fps, 2)
+        self._writer = cv2.VideoWriter(
+            self._filename, self._encoding, self._fps, self._size
+        )
+        for frame, timestamp, isPooled in self._warmupItems:
+            self._writeOnTimeline(frame, timestamp)
+            if isPooled:
+                self._release(frame)
+        self._warmupItems.clear()
+
+    def _writeOnTimeline(self, frame: cv2.typing.MatLike, timestamp: float):
+        """
+        Write a frame once or, on the timeline, as many times as its slot needs.
+        """
+        copies = 1
+        if self._lockToTimeline and timestamp is not None:
+            if self._timelineStart is None:
+                self._timelineStart = timestamp
+            # Fill any slots skipped since the previous frame with this one.
+            slot = int(round((timestamp - self._timelineStart) * self._fps))
+            copies = slot - self._framesWritten + 1
+            if copies < 1:
+                self._lateFrames += 1
+                return
+            self._duplicatedFrames += copies - 1
+
+        for _ in range(copies):
+            startTime = time.perf_counter()
+            self._writer.write(frame)
+            self._lastEncodeLatency = time.perf_counter() - startTime
+            self._totalEncodeTime += self._lastEncodeLatency
+            self._framesWritten += 1
+
+    def _spillPath(self) -> str:
+        if self._spillDir is None:
+            self._spillDir = tempfile.TemporaryDirectory(prefix="mycameo_spill_")
+        return os.path.join(self._spillDir.name, f"{self._spilledFrames:08d}.npy")
+
+    def _isHeadPending(self) -> bool:
+        if not self._items or not isinstance(self._items[0][0], str):
+            return False
+        return self._items[0][0] in self._pendingSpills
+
+    def _release(self, frame: cv2.typing.MatLike):
+        if self._bufferPool is not None:
+            self._bufferPool.release(frame)
+
+    def _updateQueueDepth(self):
+        self._maxQueueDepth = max(self._maxQueueDepth, len(self._items))
@@ -1,22 +1,101 @@
 import cv2
+import time
 
 
 class WindowManager(object):
-    def __init__(self, windowName, keypressCallback=None):
+    """
+    The WindowManager class shows frames in a window and polls its events.
+
+    The display can be decoupled from the frame rate: maxDisplayFps limits
+    how many frames per second reach imshow (the others are skipped, but
+    still processed and recorded by the caller), eventPollInterval limits
+    how often waitKey runs, and a previewScale below 1 shows a downscaled
+    proxy of each frame.
+    """
+
+    def __init__(
+        self,
+        windowName,
+        keypressCallback=None,
+        maxDisplayFps: float = None,  # None shows every frame
+        eventPollInterval: float = None,  # seconds; None polls on every call
+        previewScale: float = 1.0,
+    ):
         self.keypressCallback = keypressCallback
+        self.maxDisplayFps: float = maxDisplayFps
+        self.eventPollInterval: float = eventPollInterval
+        self.previewScale: float = previewScale
 
         self._windowName = windowName
         self._isWindowCreated = False
 
+        # private properties for the display throttle
+        self._nextShowTime: float = None
+        self._lastPollTime: float = None
+        self._previewFrame = None
+        self._framesShown: int = 0
+        self._framesSkipped: int = 0
+
     @property
     def isWindowCreated(self):
         return self._isWindowCreated
 
+    @property
+    def framesShown(self) -> int:
+        return self._framesShown
+
+    @property
+    def framesSkipped(self) -> int:
+        """Frames passed to show() that the display throttle skipped."""
+        return self._framesSkipped
+
     def createWindow(self):
         cv2.namedWindow(self._windowName)
         self._isWindowCreated = True
 
+    def isFrameDue(self) -> bool:
+        """
+        Return whether the next call to show() will display its frame, so
+        that callers can skip preparing frames that would not be shown.
+        """
+        if not self.maxDisplayFps or self._nextShowTime is None:
+            return True
+        return time.perf_counter() >= self._nextShowTime
+
     def show(self, frame):
+        if not self.isFrameDue():
+            self._framesSkipped += 1
+            return
+
+        if self.maxDisplayFps:
+            now = time.perf_counter()
+            interval = 1.0 / self.maxDisplayFps
+            # Keep a steady cadence, but restart it after falling behind.
+            if self._nextShowTime is None or now - self._nextShowTime > interval:
+                self._nextShowTime = now
+            self._nextShowTime += interval
+
+        self._display(self._preview(frame))
+        self._framesShown += 1
+
+    def _preview(self, frame):
+        """
+        Return the frame, or a downscaled proxy of it if previewScale < 1.
+        """
+        if self.previewScale >= 1.0:
+            return frame
+        height, width = frame.shape[:2]
+        size = (
+            max(1, int(round(width * self.previewScale))),
+            max(1, int(round(height * self.previewScale))),
+        )
+        # cv2.resize() reuses the buffer while the size stays the same.
+        self._previewFrame = cv2.resize(
+            frame, size, self._previewFrame, interpolation=cv2.INTER_AREA
+        )
+        return self._previewFrame
+
+    def _display(self, frame):
         cv2.imshow(self._windowName, frame)
 
     def destroyWindow(self):
@@ -24,6 +103,24 @@ class WindowManager(object):
         self._isWindowCreated = False
 
     def processEvents(self):
+        if self._isPollSkipped():
+            return
         keycode = cv2.waitKey(1)
         if self.keypressCallback is not None and keycode != -1:
             self.keypressCallback(keycode)
+
+    def _isPollSkipped(self) -> bool:
+        """
+        Return whether to skip this poll because the last one was less than
+        eventPollInterval seconds ago.
+        """
+        if not self.eventPollInterval:
+            return False
+        now = time.perf_counter()
+        if (
+            self._lastPollTime is not None
+            and now - self._lastPollTime < self.eventPollInterval
+        ):
+            return True
+        self._lastPollTime = now
+        return False